@@ -1,19 +1,25 @@
 import numpy as np
-from SpreadLine.utils import Session
+from concurrent.futures import ProcessPoolExecutor
 from SpreadLine.utils.helpers import _sparse_argsort
 import math
 
 ALPHA = 0.1
 # MINIMIZE the wiggle lines in the layout
-def aligning(liner, orderedEntities, orderedIdleEntities):
+def aligning(liner, orderedEntities, orderedIdleEntities, frozen: np.ndarray = None):
+    """
+    Align the entities in neighboring timestamps to maximize the number of straight lines.
+    With `frozen`, the alignments of the leading timestamps are kept as is, and only the rest are computed.
+    """
     (numEntities, numTimestamps) = liner.span
+    startIdx: int = 0 if frozen is None else frozen.shape[1]
     # rewards those who can lead to most straight lines through alignment
-    rewards = _compute_rewards(liner, orderedEntities, orderedIdleEntities)
+    rewards = _compute_rewards(liner, orderedEntities, orderedIdleEntities, startIdx)
 
     #IMPORTANT!: up to here the crossing did not happen
     alignTable = np.full(liner.span, -1)
-    for cIdx in range(0, numTimestamps - 1):
-        alignment = longest_common_substring(len(orderedEntities[cIdx]), len(orderedEntities[cIdx + 1]), rewards[cIdx])
+    if startIdx > 0: alignTable[:, :startIdx] = frozen
+    alignments: list[dict] = _batch_longest_common_substring(orderedEntities[startIdx:], rewards, workers=liner._config.get('alignWorkers', 1))
+    for cIdx, alignment in enumerate(alignments, start=startIdx):
         for (currEnt, nextEnt) in alignment.items(): #key, value being alignId
             #alignTable[currEnt, cIdx] = nextEnt
             #NOTE: this would be retrieving correct entities
@@ -28,6 +34,23 @@ def aligning(liner, orderedEntities, orderedIdleEntities):
     
     return alignTable, sessionAlignTable
 
+def _batch_longest_common_substring(orderedEntities, rewards, workers: int = 1) -> list[dict]:
+    """
+    Aligns every pair of consecutive timestamps. Each pair is independent of the others, 
+    so with more than one worker the pairs are dispatched to a process pool, in chunks to amortize the inter-process cost.
+
+    Returns:
+        list[dict]: The alignment of each pair of consecutive timestamps, in the order of the timestamps.
+    """
+    numPairs: int = len(rewards)
+    currLengths: list[int] = [len(orderedEntities[cIdx]) for cIdx in range(0, numPairs)]
+    nextLengths: list[int] = [len(orderedEntities[cIdx + 1]) for cIdx in range(0, numPairs)]
+    if workers is None or workers <= 1 or numPairs <= 1:
+        return list(map(longest_common_substring, currLengths, nextLengths, rewards))
+    chunksize: int = max(1, numPairs // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(longest_common_substring, currLengths, nextLengths, rewards, chunksize=chunksize))
+
 def _align_sessions(liner, alignTable: np.ndarray, orderedEntities: np.ndarray) -> list[dict]:
     """
     Aligns the sessions based on the alignment table, which aligns individual entities.
@@ -62,116 +85,101 @@ def _align_sessions(liner, alignTable: np.ndarray, orderedEntities: np.ndarray)
     return sessionAlignTable
 
 # compute sim(l_i, r_j), the similarity between sessions
-def _compute_rewards(liner, orderedEntities, orderedIdleEntities):
+def _compute_rewards(liner, orderedEntities, orderedIdleEntities, startIdx: int = 0):
     """
     Given two entities at two consecutive timestamps, we align the pair with the highest reward.
     The reward is the possible maximum number of straight lines plus the similarity of their relative orders.
     We enforce the ego should maintain the straight line so reward[ego, ego] should be the highest among reward[ego, :].
+
+    The straight-line counts are computed once per session pair, through a session x session overlap matrix, 
+    and then broadcast to every pair of entities in the two sessions.
+    The rewards are computed from the pair (startIdx, startIdx + 1) onwards.
     """
-    (_, numTimestamps) = liner.span
-    rewards: list[list[list[int]]] = [] # 3D array, (numTimestamps, numSessionsPerTimestamp, numEntitiesPerSession)
+    (numEntities, numTimestamps) = liner.span
+    rewards: list[np.ndarray] = [] # (numTimestamps, numCurrentEntities, numNextEntities), kept as a list since the shapes vary
     ego = liner.egoIdx
-    names = liner.entities_names
-    for cIdx in range(0, numTimestamps-1):
-        currentReward: list[list[int]] = [] # (numCurrentEntities, numNextEntities)
-        currentEntities: list[int] = orderedEntities[cIdx] # the indices of the entities
-        nextEntities: list[int] = orderedEntities[cIdx + 1]
-        #print([names[each] for each in currentEntities], [names[each] for each in nextEntities], 'yo')
-        
-        for currOrder, currEnt in enumerate(currentEntities):
-            currEntReward: list[int] = []
-            for nextOrder, nextEnt in enumerate(nextEntities):
-                #NOTE: where bend or align constraints happen, line 53
-                reward = 0
-                currSessionEntIds: list[int] = _get_entities_in_session(currEnt, cIdx, liner, orderedIdleEntities[cIdx])
-                nextSessionEntIds: list[int] = _get_entities_in_session(nextEnt, cIdx+1, liner, orderedIdleEntities[cIdx + 1])
-                # straight(l_i, r_j), the maximum number of staight lines we can get from these two sessions
-                #if cIdx == 4:
-                #    print('yo', currSessionEntIds, nextSessionEntIds, np.in1d(currSessionEntIds, nextSessionEntIds))
-                num_straight_lines = np.in1d(currSessionEntIds, nextSessionEntIds).sum()
-                reward += num_straight_lines
-                # similarity of the relative order
-                compatibility = ALPHA * (1 - np.abs(
-                    ((currOrder + 1) / len(currSessionEntIds)) -  # + 1 because starts at 0
-                    ((nextOrder + 1) / len(nextSessionEntIds))
-                ))
-                reward += compatibility
-                #If we are comparing ego across tiemstamps, then we want ensure the straight line by maximizing this reward
-                if currEnt == ego and nextEnt == ego: reward = math.inf
-                currEntReward.append(reward)
-            currentReward.append(currEntReward)
-        rewards.append(np.array(currentReward))
-    rewards = np.array(rewards, dtype=object)
+    sessionTable: np.ndarray = liner._tables.get('session')
+    idleLoc = liner.locations.get('idle')
+    for cIdx in range(startIdx, numTimestamps-1):
+        currentEntities: np.ndarray = np.asarray(orderedEntities[cIdx], dtype=int) # the indices of the entities
+        nextEntities: np.ndarray = np.asarray(orderedEntities[cIdx + 1], dtype=int)
+        currGroups, currSizes, currMembership = _group_entities_by_session(liner, sessionTable[:, cIdx], currentEntities, orderedIdleEntities[cIdx], idleLoc, numEntities)
+        nextGroups, nextSizes, nextMembership = _group_entities_by_session(liner, sessionTable[:, cIdx + 1], nextEntities, orderedIdleEntities[cIdx + 1], idleLoc, numEntities)
+        # straight(l_i, r_j), the maximum number of staight lines we can get from these two sessions,
+        # i.e., the members of l_i, counted as many times as listed, that are also in r_j
+        overlap: np.ndarray = currMembership @ (nextMembership > 0).T # (numCurrentSessions, numNextSessions)
+        numStraightLines: np.ndarray = overlap[np.ix_(currGroups, nextGroups)]
+        # similarity of the relative order, + 1 because the order starts at 0
+        currRelativeOrder: np.ndarray = (np.arange(len(currentEntities)) + 1) / currSizes[currGroups]
+        nextRelativeOrder: np.ndarray = (np.arange(len(nextEntities)) + 1) / nextSizes[nextGroups]
+        compatibility: np.ndarray = ALPHA * (1 - np.abs(currRelativeOrder[:, np.newaxis] - nextRelativeOrder[np.newaxis, :]))
+        currentReward: np.ndarray = numStraightLines + compatibility
+        #If we are comparing ego across tiemstamps, then we want ensure the straight line by maximizing this reward
+        currentReward[np.ix_(currentEntities == ego, nextEntities == ego)] = math.inf
+        rewards.append(currentReward)
     return rewards
 
-def _get_entities_in_session(rIdx:int, cIdx:int, liner, orderedIdleEntities) -> list[int]:
+def _group_entities_by_session(liner, sessionIDs: np.ndarray, entities: np.ndarray, idleEntities: list[int], idleLoc: set, numEntities: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Get the list of entities in the session where the given entity is in.
+    Group the given entities at one timestamp by the session they are in, where all the idle sessions are treated as a single one, i.e., `idleEntities`.
+    The members of a contact session are the ones it lists, where an entity related to the ego in both directions is listed, and counted, twice.
+
+    Returns:
+        the group index of each entity, the number of members of each group, and the (numGroups, numEntities) membership matrix, 
+        where each cell counts how many times the entity is listed in the group.
     """
-    #get the sessionID given the chararcter id and the timestamp
-    sessionID = liner.entities[rIdx].getAtTimestamp(cIdx)
-    idleLoc = liner.locations.get('idle')
-    sessionTable = liner._tables.get('session')
-    # get the Session instance given the id
-    #NOTE: this only gives the tradeSession
-    session: Session = liner.getSessionByID(sessionID)
-    # return the indices of the entities of a session at given timestamp
-    if sessionID in idleLoc:
-        #entities = np.argwhere(sessionTable[:, cIdx] == sessionID).flatten().tolist()
-        return orderedIdleEntities
-    #print('contact', rIdx, cIdx, session.getEntityIDs(), sessionID)
-    return session.getEntityIDs()
+    sessions: np.ndarray = sessionIDs[entities]
+    # Zero never appears among the present entities, so it is used to bundle all the idle entities together
+    isIdle: np.ndarray = np.isin(sessions, list(idleLoc))
+    sessions = np.where(isIdle, 0, sessions)
+    uniqueSessions, groups = np.unique(sessions, return_inverse=True)
+    groups = groups.reshape(-1)
+    members: list[np.ndarray] = [np.asarray(idleEntities if session == 0 else liner.getSessionByID(session).getEntityIDs(), dtype=int) for session in uniqueSessions]
+    sizes: np.ndarray = np.array([len(each) for each in members], dtype=int)
+    membership: np.ndarray = np.zeros((len(sizes), numEntities), dtype=int)
+    np.add.at(membership, (np.repeat(np.arange(len(sizes)), sizes), np.concatenate(members)), 1)
+    return groups, sizes, membership
 
 # find maximum sum of the matched pairs between entities
-def longest_common_substring(currLength: int, nextLength: int, reward: dict) -> dict:
+def longest_common_substring(currLength: int, nextLength: int, reward: np.ndarray) -> dict:
     """
     Finds the longest common substring between two sequences using dynamic programming.
+    The table is filled row by row: within a row, the only dependency is on the cell to the left, i.e., a running maximum.
+    Ties are broken as [aligned, left goes up, right goes up], the same as taking the first maximum among the candidates.
 
     Args:
         currLength (int): The length of the current sequence.
         nextLength (int): The length of the next sequence.
-        reward (dict): A dictionary representing the reward matrix for aligning elements.
+        reward (np.ndarray): A (currLength, nextLength) array representing the reward matrix for aligning elements.
 
     Returns:
         dict: A dictionary representing the alignment table, where the keys are indices of the current sequence
               and the values are the corresponding indices of the next sequence.
 
     """
-    matchTable = {} # default is 0
-    # Initialization
+    reward = np.asarray(reward, dtype=float).reshape(currLength, nextLength)
+    # The extra leading row and column are the zeros for out-of-range cells
+    matchTable: np.ndarray = np.zeros((currLength + 1, nextLength + 1), dtype=float)
+    # 0: i and j should be aligned; 1: i should not align with j, i.e., left goes up; 2: j should not align with i, i.e., right goes up
+    direction: np.ndarray = np.zeros((currLength, nextLength), dtype=np.int8)
     for i in range(0, currLength):
-        matchTable[i] = {}
-        for j in range(0, nextLength):
-            matchTable[i][j] = 0
-    # memoization
-    direction = {}
-    for i in range(0, currLength):
-        direction[i] = {}
-        for j in range(0, nextLength):
-            candidates = [
-                matchTable.get(i-1, {}).get(j-1, 0) + reward[i, j], # i and j should be aligned
-                matchTable.get(i, {}).get(j-1, 0), # i should not align with j, so maybe try j - 1, i.e., left goes up
-                matchTable.get(i-1, {}).get(j, 0)  # j should not align with i, so maybe try i - 1, i.e., right goes up
-            ]
-            maxValue = max(candidates)
-            maxIdx = candidates.index(maxValue)
-            matchTable[i][j] = maxValue
-            direction[i][j] = maxIdx
+        aligned: np.ndarray = matchTable[i, :-1] + reward[i]
+        up: np.ndarray = matchTable[i, 1:]
+        best: np.ndarray = np.maximum.accumulate(np.maximum(np.maximum(aligned, up), 0))
+        left: np.ndarray = np.concatenate(([0], best[:-1]))
+        matchTable[i + 1, 1:] = best
+        direction[i] = np.where(aligned == best, 0, np.where(left == best, 1, 2))
 
     alignTable: dict = {}
     currPtr: int = currLength - 1
     nextPtr: int = nextLength - 1
     while (currPtr >= 0 and nextPtr >= 0):
-        if (direction[currPtr][nextPtr] == 0): # aligned
+        if (direction[currPtr, nextPtr] == 0): # aligned
             alignTable[currPtr] = nextPtr
             currPtr -= 1
             nextPtr -= 1
-        elif (direction[currPtr][nextPtr] == 1):
+        elif (direction[currPtr, nextPtr] == 1):
             nextPtr -= 1 # this entity in nextTime is not aligning with anyone
-        elif (direction[currPtr][nextPtr] == 2):
-            currPtr -= 1 # this entity in currentTime is not aligning with anyone
         else:
-            break
+            currPtr -= 1 # this entity in currentTime is not aligning with anyone
     return alignTable
-
-
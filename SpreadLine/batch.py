@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from SpreadLine.spreadline import SpreadLine, _read_file
+from SpreadLine.utils import str_to_datetimes, _check_validity
+
+class SpreadLineBatch():
+    """Produce the rendered layouts of SpreadLine for many egos that share the same topology.
+
+    The topology is parsed and indexed once, bucketed by time, where each entity records the time buckets it appears in.
+    Each ego then only receives the relations at the times it appears, without parsing or scanning the whole topology again.
+
+    Attributes
+    ----------
+    _topo: pd.DataFrame
+        The parsed topology, sorted by time, whose index is the original position of each relation.
+    _buckets: np.ndarray
+        The [start, end) row ranges of each unique time in `_topo`, in shape (numBuckets, 2).
+    _entity_buckets: dict
+        The bucket indices where each entity appears, either as the source or the target.
+    _template: SpreadLine
+        Stores the shared line colors, node contexts, contents, and configurations for every ego.
+
+
+    Methods
+    -------
+    load:
+
+    center:
+
+    configure:
+
+    fit:
+    """
+    def __init__(self):
+        self._topo: pd.DataFrame = None
+        self._buckets: np.ndarray = np.empty((0, 2), dtype=int)
+        self._entity_buckets: dict = {}
+        self._template: SpreadLine = SpreadLine()
+        self._center: dict = {}
+
+    def load(self, filePath: str|pd.DataFrame, config: dict, key: str = 'topology', jsonOrient: str='split'):
+        """Same as `SpreadLine.load()`, where every ego shares the loaded data."""
+        if key != 'topology': 
+            self._template.load(filePath, config, key=key, jsonOrient=jsonOrient)
+            return
+        receipient = _read_file(filePath, jsonOrient)
+        if not isinstance(receipient, pd.DataFrame): raise NotImplementedError("Not supported file types")
+        self._topo = _check_validity(receipient, config, rules = ["time", "source", "target", "weight"])
+
+    def center(self, timeExtents: list[str] = None, timeDelta: str = 'day', timeFormat: str = "%Y-%m-%d", groups: dict = {}):
+        """Parse and index the topology once. The parameters are the same as `SpreadLine.center()` but shared by every ego.
+
+        Parameters
+        ----------
+        groups: dict. The groups of entities per ego, i.e., the keys are the egos and the values are `groups` in `SpreadLine.center()`.
+        """
+        self._center = {'timeExtents': timeExtents, 'timeDelta': timeDelta, 'timeFormat': timeFormat, 'groups': groups}
+        topo: pd.DataFrame = self._topo
+        topo['time'] = str_to_datetimes(topo['time'], timeFormat)
+        # The index keeps the original positions, so that each ego receives the relations in their original order
+        topo = topo.reset_index(drop=True).sort_values(by='time', kind='stable')
+        _, starts, counts = np.unique(topo['time'].to_numpy(), return_index=True, return_counts=True)
+        self._buckets = np.vstack((starts, starts + counts)).T
+        bucketIDs: np.ndarray = np.repeat(np.arange(len(starts)), counts)
+        appearances = pd.DataFrame({
+            'entity': np.concatenate([topo['source'].to_numpy(), topo['target'].to_numpy()]),
+            'bucket': np.concatenate([bucketIDs, bucketIDs]),
+        }).drop_duplicates()
+        self._entity_buckets = {entity: group.to_numpy() for entity, group in appearances.groupby(by='entity')['bucket']}
+        self._topo = topo
+
+    def configure(self, config: dict):
+        self._template.configure(config)
+
+    def add_hook(self, hook):
+        """Registers a callback that receives the stage events of every ego, see `SpreadLine.add_hook()`.
+        With more than one worker, the hook runs in the worker processes, so it has to be picklable."""
+        self._template.add_hook(hook)
+
+    def remove_hook(self, hook):
+        self._template.remove_hook(hook)
+
+    def get_topology(self, ego: str) -> pd.DataFrame:
+        """Returns the parsed relations at the times where the ego appears."""
+        buckets: np.ndarray = self._entity_buckets.get(ego, np.array([], dtype=int))
+        if len(buckets) == 0: raise KeyError(f"{ego} is not found in the topology")
+        rows: np.ndarray = np.concatenate([np.arange(start, end) for (start, end) in self._buckets[buckets]])
+        return self._topo.iloc[rows, :].sort_index()
+
+    def fit(self, egos: list[str], width: int = 1400, height: int = 500, workers: int = 1):
+        """Generate and render the layout of each ego, which are yielded as soon as they are finished.
+
+        Parameters
+        ----------
+        egos: list[str]. The names of the egos.
+        width: int. The desired width of the visualization in screen pixels.
+        height: int. The desired height of the visualization in screen pixels.
+        workers: int. The number of processes, 1 computes the egos sequentially in the order of `egos`.
+
+        Yields
+        ------
+        (ego, render): tuple[str, dict]. The name of the ego and its rendering information, see `SpreadLine.fit()`.
+        """
+        if workers is None or workers <= 1:
+            for ego in egos:
+                yield ego, _fit_ego(self, ego, width, height)
+            return
+        # Each process receives the shared topology once, instead of once per ego
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker, initargs=(self,)) as executor:
+            futures = {executor.submit(_fit_shared_ego, ego, width, height): ego for ego in egos}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _fit_ego(batch: SpreadLineBatch, ego: str, width: int, height: int) -> dict:
+    template: SpreadLine = batch._template
+    center: dict = batch._center
+    liner = SpreadLine()
+    liner._topo = batch.get_topology(ego)
+    liner._node_color = template._node_color
+    liner._node_context = template._node_context
+    liner._content = template._content
+    liner._content_config = dict(template._content_config)
+    liner._line_color = template._line_color
+    liner._config = dict(template._config)
+    liner._hooks = list(template._hooks)
+    liner.center(ego, timeExtents=center.get('timeExtents'), timeDelta=center.get('timeDelta'), 
+                 timeFormat=center.get('timeFormat'), groups=center.get('groups').get(ego, {}))
+    return liner.fit(width=width, height=height)
+
+_SHARED_BATCH: SpreadLineBatch = None
+
+def _initialize_worker(batch: SpreadLineBatch):
+    global _SHARED_BATCH
+    _SHARED_BATCH = batch
+
+def _fit_shared_ego(ego: str, width: int, height: int) -> dict:
+    return _fit_ego(_SHARED_BATCH, ego, width, height)
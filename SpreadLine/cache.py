@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+import pandas as pd
+
+CACHE_VERSION = 1 # Bump this when the layout changes for the same inputs, so that the stored layouts are not reused
+
+def fingerprint(liner, width: int, height: int) -> str:
+    """
+    Hash every input of `.fit()`: the topology, node contexts, and content layout, the line colors, the content and layout configurations,
+    the ego and the other arguments of `.center()`, and the screen size. The same inputs always produce the same layout.
+    """
+    digest = hashlib.sha256()
+    for frame in [liner._topo, liner._node_color, liner._content]:
+        _update_with_frame(digest, frame)
+    meta: dict = {
+        'version': CACHE_VERSION,
+        'ego': liner.ego,
+        'timeExtents': liner._time_extents,
+        'timeDelta': liner._time_delta,
+        'timeFormat': liner.time_format,
+        'groups': _normalize(liner._groups),
+        'lineColor': liner._line_color,
+        'contentConfig': liner._content_config,
+        'config': liner._config,
+        'size': [width, height],
+    }
+    digest.update(json.dumps(meta, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def _update_with_frame(digest, frame: pd.DataFrame):
+    if frame is None:
+        digest.update(b'None')
+        return
+    digest.update(json.dumps([str(each) for each in frame.columns]).encode())
+    digest.update(json.dumps([str(each) for each in frame.dtypes]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+
+def _normalize(value):
+    """Sets are sorted so that their hash does not depend on the iteration order."""
+    if isinstance(value, dict): return {str(key): _normalize(each) for key, each in value.items()}
+    if isinstance(value, (set, frozenset)): return sorted([_normalize(each) for each in value], key=str)
+    if isinstance(value, (list, tuple)): return [_normalize(each) for each in value]
+    return value
+
+
+class LayoutCache():
+    """Stores the rendered layouts by the fingerprint of their inputs, see `fingerprint()`.
+
+    The layouts are kept pickled in memory, so every hit returns a new copy, and the least recently used ones are evicted
+    once there are more than `maxEntries` layouts or their total size exceeds `maxBytes`.
+    With `directory`, the layouts are also stored on disk, which persists across processes and is checked upon memory misses.
+
+    Attributes
+    ----------
+    stats: dict
+        "hits" (including "diskHits"), "misses", and "evictions" so far, and the current "entries" and "bytes" in memory.
+    """
+    def __init__(self, maxEntries: int = 128, maxBytes: int = None, directory: str = None):
+        self.maxEntries: int = maxEntries
+        self.maxBytes: int = maxBytes
+        self.directory: str = directory
+        self._entries: OrderedDict = OrderedDict() # fingerprint -> pickled layout, from the least to the most recently used
+        self._bytes: int = 0
+        self.stats: dict = {'hits': 0, 'diskHits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+        if directory is not None: os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> dict|None:
+        """Returns a copy of the stored layout, or None if not found."""
+        data: bytes = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return pickle.loads(data)
+        data = self._read(key)
+        if data is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        self.stats['diskHits'] += 1
+        self._store(key, data)
+        return pickle.loads(data)
+
+    def put(self, key: str, layout: dict):
+        data: bytes = pickle.dumps(layout, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, data)
+        self._write(key, data)
+
+    def clear(self):
+        """Removes every layout in memory and on disk."""
+        self._entries.clear()
+        self._bytes = 0
+        self._update_stats()
+        if self.directory is None: return
+        for fileName in os.listdir(self.directory):
+            if fileName.endswith('.pkl'): os.remove(os.path.join(self.directory, fileName))
+
+    def _store(self, key: str, data: bytes):
+        if key in self._entries: self._bytes -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self._bytes += len(data)
+        while len(self._entries) > 0 and (len(self._entries) > self.maxEntries or (self.maxBytes is not None and self._bytes > self.maxBytes)):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.stats['evictions'] += 1
+        self._update_stats()
+
+    def _update_stats(self):
+        self.stats.update({'entries': len(self._entries), 'bytes': self._bytes})
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def _read(self, key: str) -> bytes|None:
+        if self.directory is None or not os.path.exists(self._get_path(key)): return None
+        with open(self._get_path(key), 'rb') as f:
+            return f.read()
+
+    def _write(self, key: str, data: bytes):
+        if self.directory is None: return
+        # Write to a temporary file first, so that other processes never read a partial layout
+        temporary: str = f'{self._get_path(key)}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, self._get_path(key))
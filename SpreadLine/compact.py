@@ -767,7 +767,6 @@ def _attempt_to_reduce_wiggles(liner, previousHeights, heights, entities, prevSe
 def _debug(liner, heightTable):
     (numEntities, numTimestamps) = liner.span
     ego = liner.egoIdx
-    names = liner.entities_names
     colors = liner._line_color
     allGroups = liner._groups
     effectiveTimestamps = liner.effective_timestamps
@@ -777,7 +776,7 @@ def _debug(liner, heightTable):
         time = effectiveTimestamps[cIdx]
         label = allTimestamps[time]
         groups = allGroups.get(label, [])
-        entities = [names.index(hop) for group in groups for hop in group]
+        entities = [liner.getEntityIndexByName(hop) for group in groups for hop in group]
         existIndices = np.where(np.isnan(heightTable[:, cIdx]) == False)[0]
         heights = np.sort(heightTable[existIndices, cIdx])
         order = np.argsort(heightTable[existIndices, cIdx])
@@ -1,8 +1,5 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import norm, cauchy
-from sklearn import preprocessing
-from sklearn.decomposition import PCA, SparsePCA
 
 # missing: closest | ignore
 #TODO: update the structure
@@ -130,6 +127,9 @@ def normalize_layout(layout: pd.DataFrame):
 
 #deprecated
 def generate_layout(data: pd.DataFrame, generator = None):
+    #NOTE: scikit-learn is imported here, since it takes most of the time to import SpreadLine and the default `.fit()` never uses it
+    from sklearn import preprocessing
+    from sklearn.decomposition import SparsePCA
     entities, timestamps = data['id'], data['timestamp']
     data = data.drop(columns=['id', 'timestamp'])
     feature_names = data.columns
@@ -0,0 +1,67 @@
+import cProfile
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+STAGES = ['ordering', 'aligning', 'compacting', 'contextualizing', 'rendering'] # the stages of `.fit()`, in order
+
+@contextmanager
+def instrument_stage(liner, stage: str):
+    """
+    Emit the "start" and "end" events of a stage to every hook registered by `SpreadLine.add_hook()`. Nothing is measured without hooks.
+
+    Both events carry "stage", "ego", "span", "numSessions" (contact sessions), and "numIdleSessions". The "end" event adds
+    "duration" in seconds, "memory", "profile", and "error", i.e., the exception raised by the stage, or None.
+    "memory" is {"delta": ..., "peak": ...} in bytes over the traced memory at the start, when `configure({'traceStageMemory': True})`
+    or tracemalloc is already tracing, otherwise None. "profile" is the pstats.Stats of the stage when `configure({'profileStages': True})`, otherwise None.
+    """
+    hooks: list = liner._hooks
+    if len(hooks) == 0:
+        yield
+        return
+    event: dict = {
+        'stage': stage,
+        'ego': liner.ego,
+        'span': tuple(liner.span),
+        'numSessions': len(liner.sessions),
+        'numIdleSessions': len(liner.locations.get('idle', [])),
+    }
+    _emit(hooks, {**event, 'event': 'start'})
+
+    tracing: bool = bool(liner._config.get('traceStageMemory')) or tracemalloc.is_tracing()
+    startedTracing: bool = tracing and not tracemalloc.is_tracing()
+    if startedTracing: tracemalloc.start()
+    if tracing:
+        tracemalloc.reset_peak()
+        startMemory: int = tracemalloc.get_traced_memory()[0]
+    profiler = cProfile.Profile() if liner._config.get('profileStages') else None
+    if profiler is not None: profiler.enable()
+
+    error = None
+    startTime: float = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        duration: float = time.perf_counter() - startTime
+        if profiler is not None: profiler.disable()
+        memory: dict = None
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            memory = {'delta': current - startMemory, 'peak': peak - startMemory}
+            if startedTracing: tracemalloc.stop()
+        _emit(hooks, {
+            **event,
+            'event': 'end',
+            'duration': duration,
+            'memory': memory,
+            'profile': pstats.Stats(profiler) if profiler is not None else None,
+            'error': error,
+        })
+
+def _emit(hooks: list, event: dict):
+    for hook in list(hooks):
+        hook(event)
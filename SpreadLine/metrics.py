@@ -0,0 +1,65 @@
+import numpy as np
+from SpreadLine.utils.helpers import _count_inversions
+from SpreadLine.compact import DISTANCE_LINE
+
+# Measure the quality of the layouts, from the tables in liner._tables after `.fit()`
+def evaluate(liner) -> dict:
+    """
+    Compute the quality metrics of the fitted layout of SpreadLine liner.
+
+    Returns:
+        dict: "crossings" between neighboring timestamps, "wiggles" as the lines that are not straight between neighboring timestamps,
+              "height" of the layout, and "whiteSpace" as the vertical space between neighboring lines beyond the line gap, summed over the timestamps.
+    """
+    tables: dict = liner._tables
+    if 'height' not in tables: raise RuntimeError("evaluate() requires a fitted SpreadLine, call fit() first")
+    return {
+        'crossings': count_crossings(tables['order']),
+        'wiggles': count_wiggles(tables['session'], tables['align']),
+        'height': compute_height(tables['height']),
+        'whiteSpace': compute_white_space(tables['height']),
+    }
+
+def count_crossings(orderTable: np.ndarray) -> int:
+    """
+    Count the crossings in the order table, i.e., (numEntities, numTimestamps) where the orders start from 1 and 0 means absent.
+    """
+    crossings: int = 0
+    for cIdx in range(0, orderTable.shape[1] - 1):
+        crossings += count_pair_crossings(orderTable[:, cIdx], orderTable[:, cIdx + 1])
+    return crossings
+
+def count_pair_crossings(currOrders: np.ndarray, nextOrders: np.ndarray) -> int:
+    """
+    Count the crossings between two timestamps, i.e., the pairs of entities present in both whose relative order is swapped.
+    The entities present have positive orders. Sorted by the current orders, the crossings are the inversions of the next orders, in O(n log^2 n).
+    """
+    shared: np.ndarray = np.flatnonzero((currOrders > 0) & (nextOrders > 0))
+    return _count_inversions(nextOrders[shared[np.argsort(currOrders[shared])]])
+
+def count_wiggles(sessionTable: np.ndarray, alignTable: np.ndarray) -> int:
+    """
+    Count the lines between neighboring timestamps that are not straight, i.e., the entity is present in both but not aligned to itself.
+    """
+    present: np.ndarray = (sessionTable[:, :-1] != 0) & (sessionTable[:, 1:] != 0)
+    straight: np.ndarray = alignTable[:, :-1] == np.arange(alignTable.shape[0])[:, np.newaxis]
+    return int(np.count_nonzero(present & ~straight))
+
+def compute_height(heightTable: np.ndarray) -> float:
+    """
+    The vertical extent of all the lines, where -1 in the height table means absent.
+    """
+    heights: np.ndarray = heightTable[heightTable != -1]
+    if heights.size == 0: return 0
+    return float(heights.max() - heights.min())
+
+def compute_white_space(heightTable: np.ndarray, lineGap: float = DISTANCE_LINE) -> float:
+    """
+    The vertical space between neighboring lines beyond `lineGap`, i.e., the gap that the compaction keeps between lines, summed over the timestamps.
+    A line that is at most `lineGap` below the previous line adds nothing, so that a tightly packed layout scores 0, where -1 in the height table means absent.
+    """
+    # The absent entities are sorted to the end of each timestamp, so that their gaps are NaN
+    heights: np.ndarray = np.sort(np.where(heightTable != -1, heightTable, np.nan), axis=0)
+    if heights.shape[0] < 2: return 0
+    gaps: np.ndarray = np.diff(heights, axis=0)
+    return float(np.nansum(np.maximum(gaps - lineGap, 0)))
@@ -1,44 +1,85 @@
+import time
 import numpy as np
 from SpreadLine.utils import Node, Session
 from SpreadLine.utils.helpers import _sparse_argsort
+from SpreadLine.metrics import count_pair_crossings
 
 
-def ordering(liner, iteration=10):
+class SweepSession():
+    """
+    The compact form of a session at a timestamp used by the sweeping: the indices of its nodes in their current order,
+    and the within-session groups to be sorted, as (startIdx, endIdx, entity indices).
+    """
+    __slots__ = ('session', 'members', 'groups')
+
+    def __init__(self, session: Session|None, members: np.ndarray, groups: list[tuple] = []):
+        self.session: Session|None = session # None for the idle sessions
+        self.members: np.ndarray = members
+        self.groups: list[tuple] = groups
+
+
+def ordering(liner, iteration=10, frozen: np.ndarray = None, timeout: float = None):
     """
     Perform ordering of sessions in SpreadLine liner. Each iteration consists of two steps: forward sweeping and backward sweeping. 
     The purpose of sweeping is to reduce the number of crossings between sessions across timestamps.
+    The sweeping operates on integer arrays: each node is an index to the entity and the order arrays, and each session per timestamp holds the indices of its nodes.
+    The iterations stop early once one leaves every order unchanged, as the following ones would not change them either.
 
     Args:
         liner (SpreadLine): The SpreadLine liner object.
-        iteration (int, optional): The number of iterations for the ordering algorithm. Defaults to 10.
+        iteration (int, optional): The maximum number of iterations for the ordering algorithm. Defaults to 10.
+        frozen (np.ndarray, optional): The order table of the leading timestamps to be kept as is. 
+            The sweeping then starts from the last of them, which is never reordered. Defaults to None.
+        timeout (float, optional): The time budget in seconds, no more iterations start after it is exceeded. Defaults to None, i.e., no limit.
 
     Returns:
         np.ndarray: The ordering results in the form of a numpy array.
+        dict: The statistics of the sweeping, "sweeps" is the number of iterations performed, "converged" is whether the orders stopped changing,
+              and "crossings" and "crossingsRemoved" are the number of crossings between neighboring timestamps after the sweeping and the number reduced by it.
     """
-    sessionsPerTimestamp: list[list[Session]] = _bundle_entities_by_timestamp(liner)
+    sessionsPerTimestamp, nodeEntities, nodeOrders, nodes = _bundle_entities_by_timestamp(liner)
     numTimestamps: int = liner._counts.get('numTimestamps')
+    numEntities: int = liner._counts.get('numEntities')
     idleLocations: list[int] = liner.locations.get('idle')
     sessionTable: np.ndarray = liner._tables.get('session', {})
+    numFrozen: int = 0 if frozen is None else frozen.shape[1]
+    startIdx: int = max(numFrozen - 1, 0) # the first timestamp to sweep from
+    stopIdx: int = numFrozen # the backward sweeping does not reorder the frozen timestamps
+    if numFrozen > 0: _apply_frozen_order(sessionsPerTimestamp[startIdx], nodeEntities, nodeOrders, frozen[:, startIdx])
 
+    def _reduce_crossings(cIdx: int, nIdx: int):
+        currOrders: np.ndarray = _get_entity_orders(sessionsPerTimestamp[cIdx], nodeEntities, nodeOrders, numEntities)
+        sessionsPerTimestamp[nIdx] = _constrained_crossing_reduction(currOrders, sessionsPerTimestamp[nIdx], nodeEntities, nodeOrders)
+
+    startTime: float = time.perf_counter()
+    initialCrossings: int = _count_crossings(sessionsPerTimestamp, nodeEntities, nodeOrders, numEntities)
+    previousState: tuple = _get_sweep_state(sessionsPerTimestamp, nodeOrders)
+    stats: dict = {'sweeps': 0, 'converged': False}
     for _ in range(0, iteration):
+        if timeout is not None and time.perf_counter() - startTime > timeout: break
         # forward sweeping
-        for cIdx in range(0, numTimestamps-1):
-            currentSessions: list[Session] = sessionsPerTimestamp[cIdx]
-            nextSessions: list[Session] = sessionsPerTimestamp[cIdx + 1]
-            sessionsPerTimestamp[cIdx + 1] = _constrained_crossing_reduction(currentSessions, nextSessions)
+        for cIdx in range(startIdx, numTimestamps-1):
+            _reduce_crossings(cIdx, cIdx + 1)
         # backward sweeping
-        for cIdx in range(numTimestamps-1, 0, -1):
-            currentSessions: list[Session] = sessionsPerTimestamp[cIdx]
-            prevSessions: list[Session] = sessionsPerTimestamp[cIdx - 1]
-            sessionsPerTimestamp[cIdx - 1] = _constrained_crossing_reduction(currentSessions, prevSessions)
+        for cIdx in range(numTimestamps-1, max(stopIdx, 0), -1):
+            _reduce_crossings(cIdx, cIdx - 1)
+        stats['sweeps'] += 1
+        currentState: tuple = _get_sweep_state(sessionsPerTimestamp, nodeOrders)
+        if all(np.array_equal(previous, current) for previous, current in zip(previousState, currentState)):
+            stats['converged'] = True
+            break
+        previousState = currentState
+    crossings: int = _count_crossings(sessionsPerTimestamp, nodeEntities, nodeOrders, numEntities)
+    stats.update({'crossings': crossings, 'crossingsRemoved': initialCrossings - crossings})
+    _update_sessions(sessionsPerTimestamp, nodeOrders, nodes)
     # populate the ordering results in the orderTable
     orderTable = np.full(liner.span, 0)
     for cIdx in range(0, numTimestamps):
-        sessions: list[Session] = sessionsPerTimestamp[cIdx]
-        nodes: list[Node] = [each for session in sessions for each in session.entities]
-        for node in nodes:
-            rIdx = node.id
-            orderTable[rIdx][cIdx] = node.order + 1 # given the default order starts from 0
+        if len(sessionsPerTimestamp[cIdx]) == 0: continue
+        members: np.ndarray = np.concatenate([session.members for session in sessionsPerTimestamp[cIdx]])[::-1]
+        entities, lastIdx = np.unique(nodeEntities[members], return_index=True) # the last node of an entity is kept
+        orderTable[entities, cIdx] = nodeOrders[members[lastIdx]] + 1 # given the default order starts from 0
+    if numFrozen > 0: orderTable[:, :numFrozen] = frozen
     
     #NOTE: update the orderedEntities to be here
     orderedEntities = [] #NOTE: this is orderTable.T
@@ -60,9 +101,20 @@ def ordering(liner, iteration=10):
     orderedIdleEntities: np.ndarray = np.array(orderedIdleEntities, dtype=object)
     orderedSessions = np.array(orderedSessions, dtype=object) # (numTimestamps, numSessionsPerTimestamps)
 
-    return orderTable, orderedEntities, orderedIdleEntities, orderedSessions
+    return orderTable, orderedEntities, orderedIdleEntities, orderedSessions, stats
+
 
-def _bundle_entities_by_timestamp(liner) -> list[list[Session]]:
+def _apply_frozen_order(sessions: list[SweepSession], nodeEntities: np.ndarray, nodeOrders: np.ndarray, frozenOrders: np.ndarray):
+    """
+    Set the order of the nodes at a timestamp to the given orders, so that it serves as a fixed reference for the sweeping.
+    """
+    sessions.sort(key=lambda x: frozenOrders[nodeEntities[x.members]].min())
+    session: SweepSession
+    for session in sessions:
+        session.members = session.members[np.argsort(frozenOrders[nodeEntities[session.members]], kind='stable')]
+        nodeOrders[session.members] = frozenOrders[nodeEntities[session.members]] - 1 # the order table starts from 1
+
+def _bundle_entities_by_timestamp(liner) -> tuple[list[list[SweepSession]], np.ndarray, np.ndarray, dict[int, Node]]:
     """
     For each timestamp, create a nested list, where each element refers to a list of sessions at a timestamp.
     Given only idle sessions may exist across timestamps, dummy sessions are created here.
@@ -72,84 +124,138 @@ def _bundle_entities_by_timestamp(liner) -> list[list[Session]]:
 
     Returns:
     A nested list of sessions, where each element refers to a session for a given timestamp.
+    The entity index and the order of each node, and the Node objects of the contact sessions by their node index.
     """
     sessionTable: np.ndarray = liner._tables.get('session', {})
     numTimestamps: int = liner._counts.get('numTimestamps')
-    sessionsPerTimestamp: list[list[Session]] = []
+    sessionsPerTimestamp: list[list[SweepSession]] = []
     idleLocations: list[int] = liner.locations.get('idle')
-    names: list[str] = liner.entities_names
+    nodeEntities: list[int] = []
+    nodeOrders: list[int] = []
+    nodes: dict[int, Node] = {}
     for cIdx in range(0, numTimestamps):
-        sessions: list[Session] = []
-        for sessionID in np.unique(sessionTable[:, cIdx]):
+        sessions: list[SweepSession] = []
+        # Group the entities by their session, where the stable sort keeps the entities ascending within each session
+        entityIndices: np.ndarray = np.argsort(sessionTable[:, cIdx], kind='stable')
+        sessionIDs, starts = np.unique(sessionTable[entityIndices, cIdx], return_index=True)
+        for sessionID, entitiesIDs in zip(sessionIDs, np.split(entityIndices, starts[1:])):
             if(sessionID == 0): continue
             if sessionID not in idleLocations:
                 session: Session = liner.getSessionByID(sessionID)
-            else: # idle session, create Session objects for idle sessions per timestamp on demand
-                entitiesIDs: list[int] = np.argwhere(sessionTable[:, cIdx] == sessionID).flatten().tolist()
-                entitiesIDs = np.sort(entitiesIDs, axis=0)
-                entities = [Node(names[each], sessionID, order=idx, index=each) for idx, each in enumerate(entitiesIDs)]
-                session: Session = Session(sessionID, entities, form='idle')
-            sessions.append(session)
+                members: list[int] = []
+                indices: dict[int, int] = {} # a node can be listed more than once in a session
+                for node in session.entities:
+                    if id(node) not in indices:
+                        indices[id(node)] = len(nodeEntities)
+                        nodes[len(nodeEntities)] = node
+                        nodeEntities.append(node.id)
+                        nodeOrders.append(node.order)
+                    members.append(indices[id(node)])
+                sessions.append(SweepSession(session, np.array(members), _get_sweep_groups(liner, session)))
+            else: # idle session, create nodes for idle sessions per timestamp on demand
+                members: np.ndarray = np.arange(len(nodeEntities), len(nodeEntities) + len(entitiesIDs))
+                nodeEntities.extend(entitiesIDs.tolist())
+                nodeOrders.extend(range(0, len(entitiesIDs)))
+                sessions.append(SweepSession(None, members))
         sessionsPerTimestamp.append(sessions)
-    return sessionsPerTimestamp
+    return sessionsPerTimestamp, np.array(nodeEntities, dtype=int), np.array(nodeOrders, dtype=int), nodes
 
-def _constrained_crossing_reduction(currentSessions: list[Session], nextSessions: list[Session]) -> Session:
-    currNodes: list[Node] = [each for session in currentSessions for each in session.entities]
+def _get_sweep_groups(liner, session: Session) -> list[tuple]:
+    """
+    Locate the groups within a session to be sorted by the sweeping, following the order of 
+    [top-2-hop-neighbors, 1-hop source neighbors by weight, ego, 1-hop target neighbors by weight, bottom-2-hop-neighbors].
+    If the group only has one element then we don't need to sort it.
+    """
+    if len(session.constraints) == 0: return []
+    topTwoHops, sourceGroup, _, targetGroup, bottomTwoHops = session.constraints
+    groups: list[list[str]] = [topTwoHops, *sourceGroup.values(), [liner.ego], *targetGroup.values(), bottomTwoHops]
     result = []
-    session: Session
+    endIdx: int = 0
+    for group in groups:
+        startIdx, endIdx = endIdx, endIdx + len(group)
+        if len(group) <= 1: continue
+        result.append((startIdx, endIdx, np.array([liner.getEntityIndexByName(each) for each in group])))
+    return result
+
+def _get_entity_orders(sessions: list[SweepSession], nodeEntities: np.ndarray, nodeOrders: np.ndarray, numEntities: int) -> np.ndarray:
+    """
+    The order of each entity at a timestamp given by its first node, where -1 means the entity is absent.
+    """
+    orders: np.ndarray = np.full(numEntities, -1)
+    if len(sessions) == 0: return orders
+    members: np.ndarray = np.concatenate([session.members for session in sessions])
+    entities, firstIdx = np.unique(nodeEntities[members], return_index=True)
+    orders[entities] = nodeOrders[members[firstIdx]]
+    return orders
+
+def _get_sweep_state(sessionsPerTimestamp: list[list[SweepSession]], nodeOrders: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The state that determines the next iteration: the nodes of all the sessions in their order, and the order of each node.
+    Given every node belongs to one session, the former also determines the order of the sessions.
+    """
+    members: list[np.ndarray] = [session.members for sessions in sessionsPerTimestamp for session in sessions]
+    return (np.concatenate(members) if len(members) != 0 else np.array([], dtype=int)), nodeOrders.copy()
+
+def _count_crossings(sessionsPerTimestamp: list[list[SweepSession]], nodeEntities: np.ndarray, nodeOrders: np.ndarray, numEntities: int) -> int:
+    """
+    Count the crossings between neighboring timestamps during the sweeping, see `metrics.count_crossings()` for the order table.
+    """
+    crossings: int = 0
+    nextOrders: np.ndarray = _get_entity_orders(sessionsPerTimestamp[0], nodeEntities, nodeOrders, numEntities) if len(sessionsPerTimestamp) != 0 else None
+    for cIdx in range(0, len(sessionsPerTimestamp) - 1):
+        currOrders: np.ndarray = nextOrders
+        nextOrders = _get_entity_orders(sessionsPerTimestamp[cIdx + 1], nodeEntities, nodeOrders, numEntities)
+        crossings += count_pair_crossings(currOrders + 1, nextOrders + 1) # the entity orders start from 0, and -1 means absent
+    return crossings
+
+def _update_sessions(sessionsPerTimestamp: list[list[SweepSession]], nodeOrders: np.ndarray, nodes: dict[int, Node]):
+    """
+    Write the ordering results back to the nodes of the contact sessions.
+    """
+    for sessions in sessionsPerTimestamp:
+        for each in sessions:
+            if each.session is None: continue
+            members: list[int] = each.members.tolist()
+            each.session.entities[:] = [nodes[nIdx] for nIdx in members]
+            for nIdx in members:
+                nodes[nIdx].order = int(nodeOrders[nIdx])
+
+def _constrained_crossing_reduction(currOrders: np.ndarray, nextSessions: list[SweepSession], nodeEntities: np.ndarray, nodeOrders: np.ndarray) -> list[SweepSession]:
+    session: SweepSession
     for session in nextSessions:
-        constraints: list[tuple] = session.constraints
-        if len(constraints) == 0:
-            result.append(session)
-            continue
-        topTwoHops, sourceGroup, _, targetGroup, bottomTwoHops = session.constraints
-        # If the group only has one element then we don't need to sort it
-        sweepRange = (0, len(topTwoHops))
-        if len(topTwoHops) > 1: _within_sort(topTwoHops, session, currNodes, sweepRange)
-        for weight, group in sourceGroup.items():
-            sweepRange = (sweepRange[1], sweepRange[1] + len(group))
-            if len(group) > 1: _within_sort(group, session, currNodes, sweepRange)
-        
-        sweepRange = (sweepRange[1], sweepRange[1] + 1) #ego
-
-        for weight, group in targetGroup.items():
-            sweepRange = (sweepRange[1], sweepRange[1] + len(group))
-            if len(group) > 1: _within_sort(group, session, currNodes, sweepRange)
-        #if len(targetGroup) > 1: _within_sort(targetGroup, session, currNodes, sweepRange)
-        sweepRange = (sweepRange[1], sweepRange[1] + len(bottomTwoHops))
-        if len(bottomTwoHops) > 1: _within_sort(bottomTwoHops, session, currNodes, sweepRange)
-        #print(session.print_entities(), 'after')
-        result.append(session)  
-    return _barycenter_sort(currNodes, nextSessions)
-
-
-def _within_sort(group: list[str], session: Session, currNodes: list[Node], sweepRange: tuple):
-    nodes = [session.findNode(each) for each in group]
-    nodes.sort(key=lambda x: x.getBarycenterLeaf(currNodes))
-    session.replaceNode(nodes, sweepRange)
+        for (startIdx, endIdx, group) in session.groups:
+            _within_sort(group, session, currOrders, nodeEntities, nodeOrders, (startIdx, endIdx))
+    return _barycenter_sort(currOrders, nextSessions, nodeEntities, nodeOrders)
+
+
+def _within_sort(group: np.ndarray, session: SweepSession, currOrders: np.ndarray, nodeEntities: np.ndarray, nodeOrders: np.ndarray, sweepRange: tuple):
+    # The first node of each entity in the session
+    entities, firstIdx = np.unique(nodeEntities[session.members], return_index=True)
+    groupNodes: np.ndarray = session.members[firstIdx[np.searchsorted(entities, group)]]
+    # The barycenter leaf is the order at the current timestamp if the entity exists there, otherwise its own order
+    leaves: np.ndarray = np.where(currOrders[group] >= 0, currOrders[group], nodeOrders[groupNodes])
+    (startIdx, endIdx) = sweepRange
+    session.members[startIdx:endIdx] = groupNodes[np.argsort(leaves, kind='stable')]
 
 # Barycenter sort example: https://github.com/Hoderu/arc-diagrams-barycenter
 #IMPORTANT! this is sorting different sessions
-def _barycenter_sort(currNodes: list[Node], nextSessions: list[Session]) -> Session:
+def _barycenter_sort(currOrders: np.ndarray, nextSessions: list[SweepSession], nodeEntities: np.ndarray, nodeOrders: np.ndarray) -> list[SweepSession]:
     """
     Ordering the sessions at the next/prev timestamp, whose barycenter is determined by the current timestamp.
     The barycenter is the sum of their order. Ideally, those with more existing elements at the current timestamps are not likely moved.
     """
-    session: Session
-    for session in nextSessions:
-        # For those in the same session, find out how many exists in the previous session
-        existed = [node.findSelf(currNodes) for node in session.entities]
-        # how many relative order persists?
-        barycenter = sum([each.order for each in list(filter(None, existed))])
-        # higer number means preference of not moving?
-        session.barycenter = barycenter / session.entityWeight
-    nextSessions.sort(key=lambda x: x.barycenter)
-    nodes: list[Node] = [each for session in nextSessions for each in session.entities]
-    for session in nextSessions:
-        for node in session.entities:
-            node.order = nodes.index(node)
+    if len(nextSessions) == 0: return nextSessions
+    sizes: np.ndarray = np.array([len(session.members) for session in nextSessions])
+    members: np.ndarray = np.concatenate([session.members for session in nextSessions])
+    # For those in the same session, find out how many exists in the previous session
+    existed: np.ndarray = currOrders[nodeEntities[members]]
+    # how many relative order persists?
+    barycenters: np.ndarray = np.add.reduceat(np.where(existed >= 0, existed, 0), np.cumsum(sizes) - sizes)
+    # higer number means preference of not moving?
+    barycenters = barycenters / sizes
+    nextSessions[:] = [nextSessions[sIdx] for sIdx in np.argsort(barycenters, kind='stable')]
+    # The order of a node is its first position among the sessions
+    members = np.concatenate([session.members for session in nextSessions])
+    uniqueNodes, firstIdx = np.unique(members, return_index=True)
+    nodeOrders[uniqueNodes] = firstIdx
     return nextSessions
-    
-
-
-
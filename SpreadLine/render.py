@@ -1,8 +1,5 @@
 import numpy as np
-from itertools import groupby
 import math
-from sklearn.neighbors import KernelDensity
-from scipy.signal import argrelextrema
 from SpreadLine.utils import Node, Session, Entity, Path
 
 TIME_UNIT = 10 
@@ -12,15 +9,46 @@ TIME_UNIT = 10
 
 # Type definitions: types.ts
 
-def rendering(size, liner):
+def rendering(size, liner, bandStretch: list[list[str]] = None):
     renderer = Renderer()    
-    renderer.fit(size, liner)
+    renderer.fit(size, liner, bandStretch)
     return renderer.render
 
+def diff_rendering(previous: dict, current: dict) -> dict:
+    """
+    Compare two rendered results of the same ego, e.g., before and after appending new relations.
+    Storylines are matched by their names and blocks by their time labels.
+
+    Returns:
+        dict: "storylines" and "blocks" both list the "added", "updated", and "removed" elements, 
+              "changed" stores the other keys whose values are different, and "render" is the current result.
+    """
+    result = {'changed': {}, 'render': current}
+    for key, identifier in [('storylines', 'name'), ('blocks', 'time')]:
+        before: dict = {each[identifier]: each for each in previous.get(key, [])}
+        after: dict = {each[identifier]: each for each in current.get(key, [])}
+        result[key] = {
+            'added': [each for name, each in after.items() if name not in before],
+            'updated': [each for name, each in after.items() if name in before and before[name] != each],
+            'removed': [each for name, each in before.items() if name not in after],
+        }
+    for key, value in current.items():
+        if key in ['storylines', 'blocks']: continue
+        if key not in previous or not _is_same_value(previous[key], value): result['changed'][key] = value
+    return result
+
+def _is_same_value(one, other) -> bool:
+    if isinstance(one, np.ndarray) or isinstance(other, np.ndarray): return np.array_equal(one, other)
+    return one == other
+
 class Renderer():
     def __init__(self):
-        self.origin = []
         self.heights = []
+        # The positions of each entity at each timestamp in pixels, in shape (numEntities, numTimestamps), NaN if the entity does not exist
+        self.startX: np.ndarray = None # the start of the block
+        self.endX: np.ndarray = None # the end of the block
+        self.posY: np.ndarray = None
+        self.validity: np.ndarray = None # True if the entity exists
         self.render = { # screen pixels
             'bandWidth': 0,
             'blockWidth': 40, # maybe the 8x of the circle size?
@@ -47,10 +75,11 @@ class Renderer():
         #    "all": True,
         #}
     
-    def fit(self, screenSize, liner):
+    def fit(self, screenSize, liner, bandStretch: list[list[str]] = None):
         span = liner.span
         width, height = screenSize.get('width'), screenSize.get('height')
-        self.fit_time(width, liner._all_timestamps, liner._config.get('bandStretch'))
+        if bandStretch is None: bandStretch = liner._config.get('bandStretch')
+        self.fit_time(width, liner._all_timestamps, bandStretch)
         self.fit_entities(span, height, liner._tables.get('presence'), liner._tables.get('height'), liner.effective_timestamps)
 
         self.prepare_time_labels(liner._all_timestamps)
@@ -142,17 +171,13 @@ class Renderer():
         self.render.update({'heightExtents': [topY, bottomY]})
         self.heights = heights
 
-        entity = np.full(span, 0, dtype=object)
         markers = self.scaleTimer.get('allBlocks')[validDomain] # [[start, end]]
-        for rIdx in range(0, span[0]):
-            for cIdx in range(0, span[1]):
-                if validTable[rIdx, cIdx] == 0: # 1 if the entity exists; 0, otherwise
-                    entity[rIdx, cIdx] = np.array([-1, -1])
-                    continue
-                x: [float, float] = markers[cIdx] # in pixels #NOTE: this was the middle points, it is now [start, end]
-                y: float = heights[rIdx, cIdx] # in pixels
-                entity[rIdx, cIdx] = np.array([x, y], dtype=object)
-        self.origin = entity
+        valid: np.ndarray = validTable != 0 # 1 if the entity exists; 0, otherwise
+        self.validity = valid
+        #NOTE: this was the middle points, it is now [start, end]
+        self.startX = np.where(valid, markers[:, 0], np.nan)
+        self.endX = np.where(valid, markers[:, 1], np.nan)
+        self.posY = np.where(valid, heights, np.nan).astype(float)
         #self.aggregateTable = aggregateTable
 
     def prepare_time_labels(self, timeLabels):
@@ -166,87 +191,73 @@ class Renderer():
         ego: int = liner.egoIdx
         names: list[str] = liner.entities_names
         color: dict = liner._line_color
-        timestamps = liner._all_timestamps
         effective_timestamps = liner.effective_timestamps
-        (numEntities, numTimestamps) = self.origin.shape
+        (numEntities, numTimestamps) = self.validity.shape
         labelTable = np.full((numEntities, numTimestamps), -1)
         sideTable = liner._tables.get('crossing')
-        result = []
+        #TODO: using original way to get the color will cause bugs, e.g., someone in 2008 but the timeList computes 2005 instead
+
+        # Each segment connects two consecutive valid positions of an entity, where the positions are ordered by the entity and then the timestamp
+        rows, cols = np.nonzero(self.validity)
+        isFirst: np.ndarray = np.ones(len(rows), dtype=bool)
+        isFirst[1:] = rows[1:] != rows[:-1]
+        isSegment: np.ndarray = ~isFirst[1:]
+        segmentRows: np.ndarray = rows[1:][isSegment]
+        left, right = cols[:-1][isSegment], cols[1:][isSegment]
+        leftStart, leftEnd = self.startX[segmentRows, left], self.endX[segmentRows, left]
+        rightStart = self.startX[segmentRows, right]
+        leftPosY, rightPosY = self.posY[segmentRows, left], self.posY[segmentRows, right]
+        startX: np.ndarray = np.where(isFirst[:-1][isSegment], 0.5*(leftStart + leftEnd), leftStart) # make the first segment start from the middle
+        isStraight: np.ndarray = leftPosY == rightPosY
+        labelTable[segmentRows[isStraight], right[isStraight]] = right[isStraight] # end
+        (control1X, control1Y), (control2X, control2Y) = _compute_bezier_line(leftEnd, leftPosY, rightStart, rightPosY)
+
+        strings = [_to_svg_numbers(each) for each in [startX, leftPosY, leftEnd, control1X, control1Y, control2X, control2Y, rightStart, rightPosY]]
+        lines: list[str] = [
+            f'M{sx},{ly} L{rs},{ry}' if straight else f'M{sx},{ly} L{le},{ly} C{c1x},{c1y} {c2x},{c2y} {rs},{ry}'
+            for straight, sx, ly, le, c1x, c1y, c2x, c2y, rs, ry in zip(isStraight.tolist(), *strings)
+        ]
+        segmentOffsets: np.ndarray = np.searchsorted(segmentRows, np.arange(0, numEntities + 1))
+        lifeStarts: np.ndarray = cols[isFirst]
+        lifeEnds: np.ndarray = cols[np.append(isFirst[1:], True)]
 
+        result = []
         for rIdx in range(0, numEntities):
-            marks = self.origin[rIdx]
-            invalidity = np.array([np.array_equal(each, np.array([-1, -1])) if each.dtype!='O' else False for each in marks])
-            #TODO: using original way to get the color will cause bugs, e.g., someone in 2008 but the timeList computes 2005 instead
-            valids = np.nonzero(~invalidity)[0]
-            lines = []
-
             lineColor ='#424242' if (rIdx == ego) else color.get(names[rIdx], '#424242')
-            lifeStart, lifeEnd = valids[0], valids[-1]
-
-            chunk = {
+            result.append({
                 "name": names[rIdx],
-                "lines": [], 
+                "lines": lines[segmentOffsets[rIdx]:segmentOffsets[rIdx+1]], 
                 "marks": [{'posX': 0, 'posY': 0, 'name': names[rIdx], 'size': 0}, {'posX': 0, 'posY': 0, 'name': names[rIdx], 'size': 0}],
                 "label": {'posX': 0, 'posY': 0, 'name': '', 'textAlign': 'start', 'line': '', 'label': ''},
                 "inlineLabels": [],
                 "color": lineColor,
                 "id": rIdx,
-                "lifespan": int(effective_timestamps[lifeEnd] - effective_timestamps[lifeStart]) + 1,
+                "lifespan": int(effective_timestamps[lifeEnds[rIdx]] - effective_timestamps[lifeStarts[rIdx]]) + 1,
                 'crossingCheck': False if sideTable[rIdx] == 0 else True,
-            }
-
-            if len(valids) == 1: 
-                result.append(chunk)
-                continue # only one point
-
-            validLines = marks[valids]
-            crossingCheck = set([np.sign(each[1]) for each in validLines])
-
-            for idx, cIdx in zip(range(1, len(validLines)), valids[1:]):
-                svgString = ''
-                leftPosY = validLines[idx - 1][1]
-                rightPosY = validLines[idx][1]
-                [leftStart, leftEnd] = validLines[idx - 1][0]
-                [rightStart, rightEnd] = validLines[idx][0]
-                start = [leftStart, leftPosY]
-                end = [rightEnd, rightPosY]
-                if idx == 1: start = [0.5*(leftStart + leftEnd), leftPosY] # make it start from the middle
-                if idx == len(validLines)-1: end = [0.5*(rightStart + rightEnd), rightPosY] # make it end in the middle
-
-                if leftPosY == rightPosY: # straight line
-                    labelTable[rIdx, valids[idx]] = valids[idx] # end
-                    svgString = f'M{_to_svg_join(start)} L{_to_svg_join([rightStart, rightPosY])}'
-                else: # bezier line
-                    control1, control2 = _compute_bezier_line([leftEnd, leftPosY], [rightStart, rightPosY])
-                    svgString = f'M{_to_svg_join(start)} L{_to_svg_join([leftEnd, leftPosY])}'
-                    svgString += f' C{_to_svg_join(control1)} {_to_svg_join(control2)} {_to_svg_join([rightStart, rightPosY])}'
-                lines.append(svgString)
-            
-            self.labelTable = labelTable
-            chunk.update({'lines': lines})
-            result.append(chunk)
+            })
+        self.labelTable = labelTable
         self.render.update({'storylines': result})
 
     def prepare_labels(self, liner):
         storylines = self.render.get('storylines')
         ego: int = liner.egoIdx
         names: list[str] = liner.entities_names
-        timestamps = liner._all_timestamps
-        (numEntities, numTimestamps) = self.origin.shape
+        (numEntities, numTimestamps) = self.validity.shape
         blockRanges = self.blockRange
+        # The first and the last timestamps of each entity
+        firstValids: np.ndarray = np.argmax(self.validity, axis=1)
+        lastValids: np.ndarray = numTimestamps - 1 - np.argmax(self.validity[:, ::-1], axis=1)
 
         for rIdx in range(0, numEntities):
-            marks = self.origin[rIdx]
-            invalidity = np.array([np.array_equal(each, np.array([-1, -1])) if each.dtype!='O' else False for each in marks])
-            valids = np.nonzero(~invalidity)[0]
             update = storylines[rIdx]
-            lineStart: [[float, float], float] = marks[valids[0]]
-            lineEnd : [[float, float], float] = marks[valids[-1]]
+            firstValid, lastValid = firstValids[rIdx], lastValids[rIdx]
+            startX, startY = self.startX[rIdx, firstValid], self.posY[rIdx, firstValid]
+            endX, endY = self.endX[rIdx, lastValid], self.posY[rIdx, lastValid]
             startVisible = 'visible'
             endVisible = 'visible'
 
-            #if self.aggregateTable[rIdx, valids[0]] != 0: startVisible = 'hidden'
-            #if self.aggregateTable[rIdx, valids[-1]] != 0: endVisible = 'hidden'
+            #if self.aggregateTable[rIdx, firstValid] != 0: startVisible = 'hidden'
+            #if self.aggregateTable[rIdx, lastValid] != 0: endVisible = 'hidden'
 
             # Part 1. prepare entity marks
             h = 7 # height of the equilateral triangle, in pixels
@@ -254,30 +265,29 @@ class Renderer():
             area = math.sqrt(3) / 4 * a * a
             symbolMarks = []
             if (rIdx != ego):
-                startMark = {'posX': lineStart[0][0] - h/2, 'posY': lineStart[1], 'name': names[rIdx], 'size': area, 'visibility': startVisible}
-                endMark = {'posX': lineEnd[0][1] + h/2, 'posY': lineEnd[1], 'name': names[rIdx], 'size': area, 'visibility': endVisible}
+                startMark = {'posX': startX - h/2, 'posY': startY, 'name': names[rIdx], 'size': area, 'visibility': startVisible}
+                endMark = {'posX': endX + h/2, 'posY': endY, 'name': names[rIdx], 'size': area, 'visibility': endVisible}
                 symbolMarks = [startMark, endMark]
 
             # Part 2. prepare entity labels
             dx = 12 # NOTE: 12 pixels apart
             dxOffset = 10
             markOffset = 2
-            others = (np.array(range(0, numEntities)) != rIdx).nonzero()
-            prevTimestamp = min([valids[0]-1, 0])
-            nextTimestamp = min([numTimestamps-1, valids[-1]+1])
-            #print(valids[0], self.heights[others, valids[0]+1], lineStart[1], lineStart[1] in self.heights[others, valids[0]+1])
-            label = {"posX": lineStart[0][0] - dx, "posY": lineStart[1], "textAlign": "end", 
-                     'line': f'M{_to_svg_join([lineStart[0][0] - dxOffset, lineStart[1]])} L{_to_svg_join([lineStart[0][0] - markOffset, lineStart[1]])}'} # marks[valids[0]]: [posX: [start, end], posY]
+            prevTimestamp = min([firstValid-1, 0])
+            nextTimestamp = min([numTimestamps-1, lastValid+1])
+            label = {"posX": startX - dx, "posY": startY, "textAlign": "end", 
+                     'line': f'M{_to_svg_join([startX - dxOffset, startY])} L{_to_svg_join([startX - markOffset, startY])}'}
             # labels should be put at the end of lines, or this init label position blocks the previous timestamp
             extents = blockRanges[:, prevTimestamp]
-            # valids[0] > (numTimestamps/2) 
-            if (extents[0] <= lineStart[1] and lineStart[1] <= extents[1] and valids[0] != 0): 
+            # firstValid > (numTimestamps/2) 
+            if (extents[0] <= startY and startY <= extents[1] and firstValid != 0): 
                 if names[rIdx] == 'Russell Brand': #FAG
-                    label = {"posX":  lineEnd[0][1] + dx, "posY": lineEnd[1], "textAlign": "start",
-                            'line': f'M{_to_svg_join([lineEnd[0][1] + markOffset, lineEnd[1]])} L{_to_svg_join([lineEnd[0][1] + dxOffset, lineEnd[1]])}'}
-                if (lineEnd[1] in self.heights[others, nextTimestamp]):
-                    label.update({"posX": lineStart[0][0] - dx, "posY": lineStart[1], "textAlign": "end",
-                                  'line': f'M{_to_svg_join([lineStart[0][0] - dxOffset, lineStart[1]])} L{_to_svg_join([lineStart[0][0] - markOffset, lineStart[1]])}'})
+                    label = {"posX":  endX + dx, "posY": endY, "textAlign": "start",
+                            'line': f'M{_to_svg_join([endX + markOffset, endY])} L{_to_svg_join([endX + dxOffset, endY])}'}
+                # whether any other entity is at the same height at the next timestamp
+                if (np.delete(self.heights[:, nextTimestamp], rIdx) == endY).any():
+                    label.update({"posX": startX - dx, "posY": startY, "textAlign": "end",
+                                  'line': f'M{_to_svg_join([startX - dxOffset, startY])} L{_to_svg_join([startX - markOffset, startY])}'})
             label.update({"label": names[rIdx], 'visibility': startVisible if label["textAlign"] == "end" else endVisible})
 
             update.update({'marks': symbolMarks, 'label': label})
@@ -290,79 +300,59 @@ class Renderer():
         names = liner.entities_names
         timeLabels = liner._all_timestamps
         context = liner.context
-        nodeContext = liner._node_color
-        nodeContext.set_index(keys=['time', 'entity'], inplace=True)
-        #print(nodeContext.index)
+        # Index the layout once, where the first match is taken if there are duplicates
+        layout = context['layout']
+        layoutLookup: dict = {}
+        for key, posX, posY in zip(layout.index, layout['posX'].to_numpy(), layout['posY'].to_numpy()): layoutLookup.setdefault(key, (posX, posY))
+        contextLookup: dict = liner._node_context # indexed upon `.load(key='node')`
+        sessionLookup: dict = {} # NOTE: assumption that only one non-idle session at one time
+        for session in sessions: sessionLookup.setdefault(session.timestamp, session)
 
-        (numEntities, numTimestamps) = self.origin.shape
+        (numEntities, numTimestamps) = self.validity.shape
         blockRender = []
         pointRender = []
-        validLabels = [each.timestamp for each in sessions]
-        layout = context['layout']
-
 
         blockRange = np.full((2, numTimestamps), -1)
-        blocks = self.scaleTimer.get('allBlocks')[validDomain]
-        validBlocks = self.scaleTimer.get('allBlocks')[validLabels]
         width = self.render.get('blockWidth', 0)
-        aggregateIDCounter = 0
-        for cIdx in range(0, numTimestamps): # NOTE: assumption that only one non-idle session at one time
-            if blocks[cIdx] not in validBlocks: continue
-            tIdx = np.where(self.scaleTimer.get('allBlocks') == blocks[cIdx])[0][0]
-            session: Session = list(filter(lambda x: x.timestamp == tIdx, sessions))[0]
+        for cIdx in range(0, numTimestamps):
+            session: Session = sessionLookup.get(validDomain[cIdx])
+            if session is None: continue
             timestamp = session.timestamp
             entities: list[int] = session.getEntityIDs()
             self.labelTable[entities, cIdx] = -1
-            hops = [list(map(lambda x: names.index(x), hop)) for hop in session.hops]
+            hops = [list(map(lambda x: liner.getEntityIndexByName(x), hop)) for hop in session.hops]
 
             # [[start, end], yPos]
-            #width = blocks[cIdx][1] - blocks[cIdx][0]
-            points = [{
-                'id': int(idx),
-                'posX': float(0.5*(each[0][0] + each[0][1])),
-                'posY': float(each[1]),
-                'name': names[idx],
-                'group': len(blockRender),
-                'aggregateGroup': 0, #int(self.aggregateTable[idx, cIdx]),
-                'visibility': 'visible' #if self.aggregateTable[idx, cIdx] == 0 else 'hidden',
-            } for idx, each in zip(entities, self.origin[entities, cIdx])]
+            pointsX: list[float] = (0.5*(self.startX[entities, cIdx] + self.endX[entities, cIdx])).tolist()
+            pointsY: list[float] = self.posY[entities, cIdx].tolist()
+            points = []
+            pointIDs: dict = {} # name -> id of the first point with the name
+            for idx, posX, posY in zip(entities, pointsX, pointsY):
+                name = names[idx]
+                (scaleX, scaleY) = layoutLookup.get((name, timestamp), (0, 0))
+                label = contextLookup.get((timeLabels[timestamp], name), None)
+                points.append({
+                    'id': int(idx),
+                    'posX': posX,
+                    'posY': posY,
+                    'name': name,
+                    'group': len(blockRender),
+                    'aggregateGroup': 0, #int(self.aggregateTable[idx, cIdx]),
+                    'visibility': 'visible', #if self.aggregateTable[idx, cIdx] == 0 else 'hidden',
+                    'scaleX': scaleX, 
+                    'scaleY': scaleY, 
+                    'label': -1 if label is None else str(label),
+                })
+                pointIDs.setdefault(name, int(idx))
 
             blockOutline, moveX = _compute_block(points, hops, width)
             # leave a 7.5% white space for each side as a gap
             [minPoint, maxPoint] = getExtents(points, key=lambda x: x['posY'])
-            #minPosY = minPoint['posY']
-            #height = width * 0.85
-            #height = abs(maxPoint['posY'] - minPosY) * 0.85 
             blockRange[:, cIdx] = [minPoint['posY'] - 5, maxPoint['posY'] + 5] # the block range 
-
-            for point in points:
-                scaleX = 0
-                scaleY = 0
-                label = -1
-                #print(timeLabels[timestamp], point['name'])
-                #print(nodeContext, timeLabels[timestamp], point['name'])
-                if (point['name'], timestamp) in layout.index:
-                    match = layout.loc[(point['name'], timestamp), :]
-                    scaleX = match['posX']
-                    scaleY = match['posY']
-                if (timeLabels[timestamp], point['name']) in nodeContext.index:
-                    #print('da fa')
-                    node = nodeContext.loc[(timeLabels[timestamp], point['name']), :]
-                    label = str(node['context'])
-                point.update({'scaleX': scaleX, 'scaleY': scaleY, 'label': label})
             #TODO: implement point collision, saw stackoverflow say force-directed layout is expensive
             pointRender.extend(points)
 
-            links = []
-            for (source, target, weight) in session.links:
-                sourceSearch = list(filter(lambda x: x['name'] == source, points))
-                targetSearch = list(filter(lambda x: x['name'] == target, points))
-                if len(sourceSearch) == 0 or len(targetSearch) == 0: 
-                    print(source, target)
-                sourcePoint = list(filter(lambda x: x['name'] == source, points))[0]
-                targetPoint = list(filter(lambda x: x['name'] == target, points))[0]
-                links.append(tuple([sourcePoint['id'], targetPoint['id']]))
-            
+            links = [tuple([pointIDs[source], pointIDs[target]]) for (source, target, weight) in session.links]
             block = {
                 'id': len(blockRender),
                 'time': timeLabels[timestamp],
@@ -371,7 +361,7 @@ class Renderer():
                 'relations': links,
                 'points': points,
                 'moveX': moveX, # height and width for the expanded block
-                'topPosY': min(points, key=lambda x: x['posY'])['posY'],
+                'topPosY': minPoint['posY'],
             }
             blockRender.append(block)
         
@@ -380,35 +370,36 @@ class Renderer():
 
     def prepare_inline_labels(self, names):
         (numEntities, numTimestamps) = self.labelTable.shape
-        storylines = [each['name'] for each in self.render.get('storylines')]
-        #print(len(storylines), 'yo')
+        storylines: list[dict] = self.render.get('storylines')
+        storylineIndices: dict = {}
+        for idx, each in enumerate(storylines): storylineIndices.setdefault(each['name'], idx)
+
+        # No inline labels within the blocks
+        withinBlocks: np.ndarray = (self.blockRange[0] < self.posY) & (self.posY < self.blockRange[1])
+        self.labelTable[(self.labelTable != -1) & withinBlocks] = -1
+
+        # The candidates are at least 3 consecutive timestamps with straight lines, where the label is put in the middle one.
+        # A column is padded to every entity, so that the consecutive timestamps never continue to the next entity
+        candidates: np.ndarray = np.zeros((numEntities, numTimestamps + 1), dtype=bool)
+        candidates[:, :-1] = self.labelTable != -1
+        candidates = candidates.ravel()
+        runStarts: np.ndarray = np.nonzero(candidates & ~np.append(False, candidates[:-1]))[0]
+        runEnds: np.ndarray = np.nonzero(candidates & ~np.append(candidates[1:], False))[0]
+        runLengths: np.ndarray = runEnds - runStarts + 1
+        middles: np.ndarray = (runStarts + runLengths // 2)[runLengths >= 3]
+        rows, cols = middles // (numTimestamps + 1), middles % (numTimestamps + 1)
+        labelsX: np.ndarray = 0.5*(self.startX[rows, cols] + self.endX[rows, cols])
+        labelsY: np.ndarray = self.posY[rows, cols]
+        offsets: np.ndarray = np.searchsorted(rows, np.arange(0, numEntities + 1))
+
         for rIdx in range(0, numEntities):
-            result = []
-            marks = self.origin[rIdx, :]
             name = names[rIdx]
-            storylineIdx = storylines.index(name)
-            candidates = []
-
-            for cIdx in range(0, numTimestamps):
-                if self.labelTable[rIdx, cIdx] == -1: continue
-                [_, posY] = marks[cIdx]
-                extents = self.blockRange[:, cIdx]
-                if extents[0] < posY and posY < extents[1]: self.labelTable[rIdx, cIdx] = -1
-
-            for _, group in groupby(enumerate(self.labelTable[rIdx, :]), lambda x: x[0] - x[1]):
-                members = [val for (_, val) in list(group)]
-                if len(members) >= 3: candidates.append(members)
-            for slots in candidates:
-                mid = math.floor(0.5*len(slots))
-                #print(slots[mid], slots)
-                targetIdx = slots[mid]
-                [[start, end], posY] = marks[targetIdx]
-                result.append({
-                    "posX": 0.5*(start + end),
-                    "posY": posY,
-                    "name": name,
-                })
-            self.render.get('storylines')[storylineIdx].update({'inlineLabels': result})
+            result = [{
+                "posX": labelsX[idx],
+                "posY": labelsY[idx],
+                "name": name,
+            } for idx in range(offsets[rIdx], offsets[rIdx+1])]
+            storylines[storylineIndices[name]].update({'inlineLabels': result})
 
 def _unstack_same_height(heightTable: np.ndarray):
     gap = 2.5
@@ -439,6 +430,9 @@ def _unstack_same_height(heightTable: np.ndarray):
     return heightTable, aggregateTable
 
 def _1d_cluster_kde(numbers, indices, bandwidth=1):
+    #NOTE: scikit-learn and SciPy are only imported once needed, which are slow to import
+    from sklearn.neighbors import KernelDensity
+    from scipy.signal import argrelextrema
     #print(indices, numbers)
     sample = np.linspace(min(numbers), max(numbers))
     nested_numbers = np.array(numbers).reshape(-1, 1)
@@ -488,10 +482,11 @@ def _compute_block(points, hops: list[list[int]], blockWidth, portion=0.35):
     rightArc = Path()
     offset = 0.005 # otherwise there might be 1px gap
     # from the top to the bottom
-    topHops = list(filter(lambda x: x['id'] in hops[0], points))
-    main = list(filter(lambda x: x['id'] in (hops[1] + hops[2] + hops[3]), points))
+    topIDs, mainIDs, bottomIDs = set(hops[0]), set(hops[1] + hops[2] + hops[3]), set(hops[4])
+    topHops = [each for each in points if each['id'] in topIDs]
+    main = [each for each in points if each['id'] in mainIDs]
     [topMain, bottomMain] = getExtents(main, key=lambda x: x['posY'])
-    bottomHops = list(filter(lambda x: x['id'] in hops[4], points))
+    bottomHops = [each for each in points if each['id'] in bottomIDs]
 
     if len(hops[0]) == 0:
         leftArc.arc(posX, topMain['posY'], radius, math.pi * (1.5 + offset), math.pi, 1)
@@ -555,21 +550,21 @@ def _compute_button_and_bars_in_block(posX: int, topPosY: int, bottomPosY: int,
     result.update({'top': topHorizontalBar.toString(), 'bottom': bottomHorizontalBar.toString()})
     return result
 
-def _compute_bezier_line(start, end):
-    width = np.abs(end[0] - start[0])
-    height = np.abs(end[1] - start[1])
-    ratio = np.round(width / height, 2)
-    if ratio >= 0: # was 0.3
-        midX = (start[0] + end[0]) * 0.5
-        control1 = np.array([midX, start[1]])
-        control2 = np.array([midX, end[1]])
-    #else: #do a different control points when the width between start and end are too narrow
-    #    higher = start[1]
-    #    if start[1] > end[1]: higher = end[1]
+def _compute_bezier_line(startX: np.ndarray, startY: np.ndarray, endX: np.ndarray, endY: np.ndarray) -> tuple[tuple, tuple]:
+    """Returns the two control points, each as (posX, posY), of the bezier lines from (startX, startY) to (endX, endY), for arrays of lines."""
+    midX: np.ndarray = (startX + endX) * 0.5
+    control1 = (midX, startY)
+    control2 = (midX, endY)
+    #NOTE: different control points could be used when the width between start and end is too narrow, e.g.,
+    #    higher = min(startY, endY)
     #    weight = 0.5
-    #    control1 = np.array([end[0], higher + weight*height])
-    #    control2 = np.array([start[0], higher + (1-weight)*height])
+    #    control1 = (endX, higher + weight*height)
+    #    control2 = (startX, higher + (1-weight)*height)
     return control1, control2
 
 def _to_svg_join(points: np.ndarray|list):
     return ','.join(np.array(points).astype(str))
+
+def _to_svg_numbers(values: np.ndarray) -> list[str]:
+    """Formats the numbers all at once the same way as `_to_svg_join()`, i.e., the shortest representation that round-trips the float."""
+    return np.asarray(values, dtype=float).astype(str).tolist()
@@ -1,15 +1,18 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime
-from SpreadLine.utils import str_to_datetime, datetime_to_str, get_time_array
+from SpreadLine.utils import str_to_datetime, str_to_datetimes, datetime_to_str, get_time_array
 from SpreadLine.utils.constructors import find_within_constraints, construct_egocentric_network, filter_time_by_ego
 from SpreadLine.order import ordering
 from SpreadLine.align import aligning
 from SpreadLine.compact import compacting
-from SpreadLine.render import rendering
+from SpreadLine.render import rendering, diff_rendering
 from SpreadLine.contextualize import contextualizing
+from SpreadLine.instrument import instrument_stage
+from SpreadLine.cache import LayoutCache, fingerprint
 from SpreadLine.utils import Node, Session, Entity, _check_validity
 
+RENDER_CONFIG = ['bandStretch', 'profileStages', 'traceStageMemory'] # the configurations that do not change the layout tables
+
 class SpreadLine():
     """Produce the rendered layout of SpreadLine.
 
@@ -19,6 +22,8 @@ class SpreadLine():
         The topology of the data. Should contain the following information: source, target, time, and edge weight.
     _node_color: pd.DataFrame
         The content of the data, to be used as the node color that helps conclude the relationship between a pair of nodes.
+    _node_context: dict
+        The context of each (time, entity) in `_node_color`, indexed once upon `.load(key='node')` and reused by every render.
     _content: pd.DataFrame
         The content of the data, to be used as the attribute-driven layout that helps understand the contextual relationships among all the nodes. 
 
@@ -46,6 +51,10 @@ class SpreadLine():
         The names of `entities`
     sessions: list[Session]
         The interactions among nodes per time point, automatically derived from the data, depending on the ego.
+    _session_index: dict, values default empty dict
+        Maps each session id to its Session in `sessions`, kept in sync by `_set_sessions`.
+    _entity_index: dict, values default empty dict
+        Maps each entity name to its index in `entities` and `entities_names`, kept in sync by `_set_entities`.
     context: dict, values default empty pd.DataFrame
         Stores the attribute-driven layout and its loadings (for interpretation if needed) that will be rendered. Keys are "layout" and "loadings".
 
@@ -58,6 +67,20 @@ class SpreadLine():
 
     configure:
 
+    fit:
+
+    append:
+
+    layout:
+
+    render:
+
+    add_hook:
+
+    remove_hook:
+
+    use_cache:
+
     """
     def __init__(self):
         self._topo: pd.DataFrame = None
@@ -67,6 +90,7 @@ class SpreadLine():
         # self._content = {"entity_category": , "entity_node":, "entity_content_layout": }
 
         self._node_color: pd.DataFrame = pd.DataFrame([], columns=['time', 'entity'])
+        self._node_context: dict = {} # (time, entity) -> the context in `_node_color`, indexed once upon loading and only read afterwards
         self._content: pd.DataFrame = None #  The layout of the block
         self._content_config: dict = { # Whether entity behavior changes over time or the layout is pre-defined by the user
             'dynamic': True,
@@ -74,6 +98,8 @@ class SpreadLine():
         }
         self._line_color: dict = {}
         self.time_format: str = ''
+        self._time_delta: str = 'day' # The time granularity, specified by `timeDelta` in `.center()` function
+        self._time_extents: list[str] = None # The time extents specified in `.center()` function, None means the entire network
         self._all_timestamps: list[str] = [] # Includes all of the dates given the date extents, consistent with the rendered time labels
         self.locations: dict = {
             'contact': [],
@@ -85,6 +111,8 @@ class SpreadLine():
         self.entities: list[Entity] = []
         self.entities_names: list[str] = []
         self.sessions: list[Session] = [] # sessions with trade
+        self._session_index: dict[int, Session] = {} # session id -> Session
+        self._entity_index: dict[str, int] = {} # entity name -> index in entities/entities_names
         self.context: dict = None 
 
 
@@ -101,19 +129,44 @@ class SpreadLine():
             'bandStretch': [],
             'squeezeSameCategory': False,
             'minimize': 'space', # 'wiggles', 'space'
+            'alignWorkers': 1, # the number of processes to align the timestamps, 1 aligns them sequentially
+            'sweepIterations': 10, # the maximum number of sweeping iterations in ordering, which stops earlier once converged
+            'sweepTimeout': None, # the time budget of the sweeping in seconds, None means no limit
+            'profileStages': False, # whether the stage events to the hooks carry a cProfile capture, see `instrument_stage()`
+            'traceStageMemory': False, # whether the stage events to the hooks carry the memory traced by tracemalloc
         }
+        self._hooks: list = [] # The callbacks that receive the stage events in `.fit()`, see `.add_hook()`
+        self._cache: LayoutCache = None # The rendered layouts by their inputs, see `.use_cache()`
 
-        self._render = {}
+        self._render = {} # The last rendered result, kept to compute the difference after `.append()`
+        self._size: dict = {} # The last screen size and band stretch in `.render()`
+        self._sweep_stats: dict = {} # The sweeping statistics of the last ordering, see `ordering()`
     
     def getSessionByID(self, ID: int) -> Session:
-        for each in self.sessions:
-            if each.id == ID: return each
-        return None
+        return self._session_index.get(ID, None)
     
     def getEntityByName(self, name: str) -> Entity:
-        for each in self.entities:
-            if each.name == name: return each
-        return None
+        rIdx = self._entity_index.get(name, None)
+        if rIdx is None: return None
+        return self.entities[rIdx]
+
+    def getEntityIndexByName(self, name: str) -> int:
+        return self._entity_index.get(name, -1)
+
+    def _set_sessions(self, sessions: list[Session]):
+        """
+        Stores the contact sessions and rebuilds the id -> Session lookup, so that every access in the pipeline is O(1).
+        """
+        self.sessions = sessions
+        self._session_index = {session.id: session for session in sessions}
+
+    def _set_entities(self, entities: list[Entity]):
+        """
+        Stores the entities and rebuilds the name -> index lookup, so that every access in the pipeline is O(1).
+        """
+        self.entities = entities
+        self.entities_names = [entity.name for entity in entities]
+        self._entity_index = {name: rIdx for rIdx, name in enumerate(self.entities_names)}
     
     def load(self, filePath: str|pd.DataFrame, config: dict, key: str = 'topology', jsonOrient: str='split'):
         """Loads the file, any pd.DataFrame, *.csv, and *.json, into _raw as a pd.DataFrame with renamed columns.
@@ -126,13 +179,8 @@ class SpreadLine():
         config: dict. Keys are fixed (see examples) with their values being the column names/keys in the provided file.
         jsonOrient: str, optional. Only used when taking the json, this specifies the orient when reading into a pd.DataFrame.
         """
-        # Reading in different types of files
-        receipient = None
-        if isinstance(filePath, pd.DataFrame): receipient = filePath
-        elif isinstance(filePath, str): 
-            fileExtension = filePath.split('.')[-1]
-            if fileExtension == 'csv': receipient: pd.DataFrame = pd.read_csv(filePath)
-            elif fileExtension == 'json': receipient: pd.DataFrame = pd.read_json(filePath, orient=jsonOrient)
+        receipient = _read_file(filePath, jsonOrient)
+        self._clear_layout()
         # Handling the loaded file differently based on the key
         if isinstance(receipient, pd.DataFrame) and key == 'topology':
             self._topo = _check_validity(receipient, config, rules = ["time", "source", "target", "weight"])
@@ -154,6 +202,7 @@ class SpreadLine():
             return
         if isinstance(receipient, pd.DataFrame) and key == 'node':
             self._node_color = _check_validity(receipient, config, rules=['time', 'entity', 'context'])
+            self._node_context = _index_node_context(self._node_color)
             return
         if isinstance(receipient, pd.DataFrame) and key == 'line':
             receipient = _check_validity(receipient, config, rules=['entity', 'color'])
@@ -176,10 +225,23 @@ class SpreadLine():
         self.time_format: str = timeFormat
         self.ego: str = ego
         self._groups = groups
+        self._time_delta = timeDelta
+        self._time_extents = timeExtents
         #print(self._topo['time'].unique().tolist())
-        self._topo['time'] = self._topo['time'].apply(lambda x: str_to_datetime(x, timeFormat))
+        # The topology might have been parsed already, e.g., when shared by SpreadLineBatch
+        if not pd.api.types.is_datetime64_any_dtype(self._topo['time']):
+            self._topo['time'] = str_to_datetimes(self._topo['time'], timeFormat)
         #print(self._topo['time'].unique().tolist())
         self._topo = filter_time_by_ego(ego, self._topo)
+        self._construct_network(timeExtents)
+
+    def _construct_network(self, timeExtents: list[str] = None):
+        """
+        Construct the egocentric network, its sessions and the tables for the layout optimization from the parsed topology.
+        """
+        self._clear_layout()
+        timeDelta: str = self._time_delta
+        timeFormat: str = self.time_format
         if not timeExtents:
             timeExtents: list[str] = [datetime_to_str(self._topo['time'].min(), timeFormat), datetime_to_str(self._topo['time'].max(), timeFormat)]
         assert len(timeExtents) == 2, "timeExtents should only take a range of timestamps."
@@ -187,7 +249,7 @@ class SpreadLine():
         #NOTE: this returns one more time point for the given time extents for the data aggregation to work as expected
         self._all_timestamps: list[str] = get_time_array(timeExtents, timeDelta, timeFormat)
         self._counts.update({'numAllTimestamps': len(self._all_timestamps)})
-        timeArray: list[datetime] = [str_to_datetime(each, timeFormat) for each in self._all_timestamps]
+        timeArray: pd.DatetimeIndex = str_to_datetimes(self._all_timestamps, timeFormat)
 
         topo_within_time: pd.DataFrame = self._topo.loc[(self._topo['time'].between(timeExtents[0], timeExtents[1], inclusive="both")), :]
 
@@ -199,25 +261,43 @@ class SpreadLine():
         self._construct_timelines_idle_sessions(sessions)
 
         self._construct_tables()
-        self.egoIdx = self.entities_names.index(self.ego)
+        self.egoIdx = self.getEntityIndexByName(self.ego)
+
+    def add_hook(self, hook):
+        """Registers a callback that receives the "start" and "end" events of each stage in `.fit()`, i.e., 
+        "ordering", "aligning", "compacting", "contextualizing", and "rendering", as a dict. See `instrument_stage()` for the keys.
+        """
+        if hook not in self._hooks: self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        if hook in self._hooks: self._hooks.remove(hook)
+
+    def use_cache(self, cache: LayoutCache|None):
+        """Reuses the rendered layouts in the cache when `.fit()` is given the same inputs, see `LayoutCache`. None disables the cache.
+        A cached layout is returned without running any stage, so the layout tables, e.g., `_tables['order']`, are not computed.
+        """
+        self._cache = cache
 
     def configure(self, config: dict):
         if not set(config.keys()).issubset(set(self._config.keys())): raise KeyError("Unmatched keys in the config")
+        if any([self._config.get(key) != value for key, value in config.items() if key not in RENDER_CONFIG]): self._clear_layout()
         self._config.update(config)
 
     # This is how we determine the hops
-    def _construct_contact_sessions(self, network: pd.DataFrame, timeArray: list[datetime]):
+    def _construct_contact_sessions(self, network: pd.DataFrame, timeArray: pd.DatetimeIndex):
         """ 
         Construct the sessions to be the Session object. One timestamp should only have one contact session.
+        Every relation is assigned to the time bucket [timeArray[tIdx], timeArray[tIdx + 1]) it falls in, all at once.
         """
         sessionID: int = 0
         sessions: list[Session] = []
         names: list[str] = self.entities_names
+        entityIndex: dict[str, int] = self._entity_index
+        buckets: np.ndarray = timeArray.searchsorted(network['time'].to_numpy(), side='right') - 1
+        inRange: np.ndarray = (buckets >= 0) & (buckets < len(timeArray) - 1)
         tIdx: int
-        time: str
-        for tIdx, time in enumerate(timeArray[:-1]):
-            entries: pd.DataFrame = network.loc[(network['time'].between(time, timeArray[tIdx + 1], inclusive="left")), :]
-            if entries.empty: continue
+        entries: pd.DataFrame
+        for tIdx, entries in network.loc[inRange, :].groupby(by=buckets[inRange], sort=True):
             sessionID += 1
             count: int = entries['weight'].sum()
             arcs: list[tuple] = entries.apply(lambda row: tuple(row[['source', 'target', 'weight']]), axis=1).tolist() 
@@ -232,13 +312,13 @@ class SpreadLine():
                 constraints, order = find_within_constraints(entries, self.ego, self._line_color)
             #print(constraints)
             entities: list[str] = [each for hop in order for each in hop]
-            entitiesIDs: list[int] = [names.index(each) for each in entities]     
+            entitiesIDs: list[int] = [entityIndex[each] for each in entities]     
             entities: list[Node] = [ Node(names[each], sessionID, order=idx, index=each) for idx, each in enumerate(entitiesIDs) ]
             indices: list[int] = entries.index.tolist()
-            session = Session(sessionID, entities, form='contact', timestamp=tIdx, weight=count, indices=indices)
+            session = Session(sessionID, entities, form='contact', timestamp=int(tIdx), weight=count, indices=indices)
             session.set(hops=order, links=arcs, constraints=constraints)
             sessions.append(session)
-        self.sessions = sessions
+        self._set_sessions(sessions)
         return sessions
 
     def _construct_entities(self, network: pd.DataFrame):
@@ -246,14 +326,13 @@ class SpreadLine():
         Build the Entity structure for each entity in the egocentric dynamic network.
         """
         entities_names: list[str] = pd.concat([network['source'], network['target']]).unique().tolist()
-        self.entities_names = entities_names
         entities = []
         #TODO: here we should also preprocess colors
         for rIdx, entity in enumerate(entities_names):
             timeline = np.full(self._counts['numAllTimestamps'], 0) 
             entitiy = Entity(name = entity, timeline = timeline, index = rIdx)
             entities.append(entitiy)
-        self.entities = entities
+        self._set_entities(entities)
         self._counts.update({'numEntities': len(entities)})
 
     def _construct_timelines_idle_sessions(self, sessions: list[dict]):
@@ -326,23 +405,172 @@ class SpreadLine():
         Returns
         -------
         render: dict. This stores the rendering information of all the visual elements as svg elements. 
+            The "ordering" key reports the sweeping, i.e., the number of sweeps performed and the crossings removed, see `ordering()`.
         """
+        if self._cache is None: return self._fit(width, height)
+        key: str = fingerprint(self, width, height)
+        result: dict = self._cache.get(key)
+        if result is None:
+            result = self._fit(width, height)
+            self._cache.put(key, result)
+            return result
+        self._clear_layout()
+        self._size = {'width': width, 'height': height, 'bandStretch': None}
+        self._render = result
+        return result
+
+    def layout(self):
+        """Computes the layout regardless of the screen size, i.e., ordering, aligning, compacting, and contextualizing, 
+        and keeps the tables for `.render()`. `.fit()` is the same as `.layout()` followed by `.render()`.
+        """
+        self._layout()
+
+    def render(self, width: int = 1400, height: int = 500, bandStretch: list[list[str]] = None) -> dict:
+        """Renders the computed layout with the given viewbox size, which computes the layout first if it is not computed yet.
+        Rendering the same layout at another size, e.g., after resizing the window, only runs this stage.
+
+        Parameters
+        ----------
+        width: int. The desired width of the visualization in screen pixels.
+        height: int. The desired height of the visualization in screen pixels.
+        bandStretch: list[list[str]], optional. The time ranges to be stretched, which overrides the configured "bandStretch" for this render.
+
+        Returns
+        -------
+        render: dict. The same as `.fit()`.
+        """
+        if 'height' not in self._tables or self.context is None: self._layout()
+        size = {'width': width, 'height': height}
+        with instrument_stage(self, 'rendering'):
+            result = rendering(size, self, bandStretch=bandStretch)
+        result.update({'ordering': self._sweep_stats})
+        self._size = {**size, 'bandStretch': bandStretch}
+        self._render = result
+        return result
+
+    def _clear_layout(self):
+        """Drops the computed layout, e.g., when its inputs change, so that `.render()` computes it again."""
+        for name in ['order', 'align', 'height', 'crossing']: self._tables.pop(name, None)
+        self.context = None
+        self._sweep_stats = {}
+
+    def append(self, filePath: str|pd.DataFrame, config: dict, jsonOrient: str='split') -> dict:
+        """Appends new relations, e.g., the edges of a new day, to a fitted SpreadLine and updates the layout incrementally.
+        The leading timestamps whose sessions are unchanged keep their order and alignment, 
+        and only the remaining timestamps are ordered and aligned against the last of them. 
+        The layout is then rendered with the size of the last `.fit()`.
+
+        Parameters
+        ----------
+        filePath: pd.dataFrame, or str that ends with ".csv" or ".json". The new relations.
+        config: dict. The same as `.load()` with key="topology".
+        jsonOrient: str, optional. Only used when taking the json, this specifies the orient when reading into a pd.DataFrame.
+
+        Returns
+        -------
+        diff: dict. The difference between the previous and the updated render, see `diff_rendering()`.
+        """
+        if len(self._render) == 0: raise RuntimeError("append() requires a fitted SpreadLine, call fit() first")
+        receipient = _read_file(filePath, jsonOrient)
+        if not isinstance(receipient, pd.DataFrame): raise NotImplementedError("Not supported file types")
+        receipient = _check_validity(receipient, config, rules = ["time", "source", "target", "weight"])
+        receipient['time'] = str_to_datetimes(receipient['time'], self.time_format)
+
+        previousNames: list[str] = self.entities_names
+        previousTables: dict = self._tables
+        previousTimestamps: np.ndarray = self.effective_timestamps
+        previousRender: dict = self._render
+
+        # Timestamps without the ego were already dropped, the new relations only add to the remaining ones
+        self._topo = filter_time_by_ego(self.ego, pd.concat([self._topo, receipient], ignore_index=True))
+        timeExtents: list[str] = self._time_extents
+        if timeExtents:
+            # Compared as times, since the formatted strings are not ordered as times for every `timeFormat`
+            latest = max(str_to_datetime(timeExtents[1], self.time_format), self._topo['time'].max())
+            timeExtents = [timeExtents[0], datetime_to_str(latest, self.time_format)]
+        self._tables = {}
+        self._construct_network(timeExtents)
+
+        # A layout from the cache has no tables to reuse
+        frozen: dict = self._find_frozen_tables(previousNames, previousTables, previousTimestamps) if 'order' in previousTables else {}
+        self._layout(frozen)
+        result = self.render(**self._size)
+        return diff_rendering(previousRender, result)
+
+    def _find_frozen_tables(self, previousNames: list[str], previousTables: dict, previousTimestamps: np.ndarray) -> dict:
+        """
+        Find the leading timestamps whose sessions did not change after appending, and map their order and alignment to the current entities.
+        A timestamp is unchanged if it has the same members in the same contact session, and the same idle members.
+        """
+        (numEntities, numTimestamps) = self.span
+        rowMapping: np.ndarray = np.array([self.getEntityIndexByName(name) for name in previousNames], dtype=int)
+        # Contact cells are compared by the session ID, idle cells are -1, and absent cells are 0
+        previousSessions = np.full((numEntities, previousTables['session'].shape[1]), 0)
+        previousSessions[rowMapping, :] = np.where(previousTables['presence'] == 1, previousTables['session'], previousTables['presence'])
+        currentSessions = np.where(self._tables['presence'] == 1, self._tables['session'], self._tables['presence'])
+
+        numFrozen: int = 0
+        for cIdx in range(0, min(numTimestamps, len(previousTimestamps))):
+            if previousTimestamps[cIdx] != self.effective_timestamps[cIdx]: break
+            if not np.array_equal(previousSessions[:, cIdx], currentSessions[:, cIdx]): break
+            numFrozen += 1
+
+        orderTable = np.full((numEntities, numFrozen), 0)
+        orderTable[rowMapping, :] = previousTables['order'][:, :numFrozen]
+        # Alignments between two frozen timestamps, whose values are entity indices as well
+        numAligned: int = max(numFrozen - 1, 0)
+        previousAlign: np.ndarray = previousTables['align'][:, :numAligned]
+        alignTable = np.full((numEntities, numAligned), -1)
+        alignTable[rowMapping, :] = np.where(previousAlign == -1, -1, rowMapping[previousAlign])
+        return {'order': orderTable, 'align': alignTable}
+
+    def _fit(self, width: int, height: int):
+        """
+        The pipeline of `.fit()`.
+        """
+        self._layout()
+        return self.render(width, height)
+
+    def _layout(self, frozen: dict = None):
+        """
+        The pipeline of `.layout()`. With `frozen`, the leading timestamps reuse the given order and alignment tables.
+        """
+        if frozen is None: frozen = {}
         # Step 1. Ordering the entities per timestamp, based on the given ordering the constraints, to minimize crossings in a sweeping manner.
-        orderTable, orderedEntities, orderedIdleEntities, orderedSessions = ordering(self)
-        self._tables.update({'order': orderTable})
+        with instrument_stage(self, 'ordering'):
+            orderTable, orderedEntities, orderedIdleEntities, orderedSessions, sweepStats = ordering(self, iteration=self._config.get('sweepIterations'), 
+                                                                                                frozen=frozen.get('order'), timeout=self._config.get('sweepTimeout'))
+            self._tables.update({'order': orderTable})
+            self._sweep_stats = sweepStats
         # Step 2. With the order fixed, align the entities in neighboring timestamps to maximize the number of straight lines.
-        alignTable, sessionAlignTable = aligning(self, orderedEntities, orderedIdleEntities)
-        self._tables.update({'align': alignTable})
+        with instrument_stage(self, 'aligning'):
+            alignTable, sessionAlignTable = aligning(self, orderedEntities, orderedIdleEntities, frozen=frozen.get('align'))
+            self._tables.update({'align': alignTable})
         # Step 3. Under the ordering constraints and assigned alignments, compact the white spaces. (TODO: make sure this is accurate)
-        heightTable, sideTable = compacting(self, orderedEntities, orderedSessions, sessionAlignTable)
-        self._tables.update({'height': heightTable, 'crossing': sideTable})
+        with instrument_stage(self, 'compacting'):
+            heightTable, sideTable = compacting(self, orderedEntities, orderedSessions, sessionAlignTable)
+            self._tables.update({'height': heightTable, 'crossing': sideTable})
         # Step 4. 
-        context = contextualizing(self)
-        self.context = context
-        # Step 5. Render
-        size = {'width': width, 'height': height}
-        result = rendering(size, self)
+        with instrument_stage(self, 'contextualizing'):
+            context = contextualizing(self)
+            self.context = context
+        # Step 5. Render, see `.render()`
 
-        return result
+def _index_node_context(nodeColor: pd.DataFrame) -> dict:
+    """Maps each (time, entity) to its context, where the first one is taken if there are duplicates."""
+    index: dict = {}
+    for time, entity, context in zip(nodeColor['time'], nodeColor['entity'], nodeColor['context'].to_numpy()):
+        index.setdefault((time, entity), context)
+    return index
+
+def _read_file(filePath: str|pd.DataFrame, jsonOrient: str='split') -> pd.DataFrame:
+    """Reads in different types of files, any pd.DataFrame, *.csv, and *.json. Returns None if the type is not supported."""
+    receipient = None
+    if isinstance(filePath, pd.DataFrame): receipient = filePath
+    elif isinstance(filePath, str): 
+        fileExtension = filePath.split('.')[-1]
+        if fileExtension == 'csv': receipient: pd.DataFrame = pd.read_csv(filePath)
+        elif fileExtension == 'json': receipient: pd.DataFrame = pd.read_json(filePath, orient=jsonOrient)
+    return receipient
 
     
\ No newline at end of file
@@ -1,3 +1,3 @@
 from .types import Node, Session, Entity, Path
-from .helpers import _check_validity, str_to_datetime, datetime_to_str, get_time_array, _sparse_argsort
+from .helpers import _check_validity, str_to_datetime, str_to_datetimes, datetime_to_str, get_time_array, _sparse_argsort
 from .constructors import construct_egocentric_network
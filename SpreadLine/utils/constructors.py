@@ -5,48 +5,78 @@ from itertools import groupby
 
 import pandas as pd
 
+HOP_LIMIT = 2  # The default maximum number of hops to include in the egocentric network.
+
 def filter_time_by_ego(ego: str, data: pd.DataFrame) -> pd.DataFrame:
-    timestamps = set(data['time'])
-    for time, group in data.groupby(by='time'):
-        nodes = group['source'].unique().tolist() + group['target'].unique().tolist()
-        if ego not in nodes:
-            timestamps.remove(time)
+    egoTimes = data.loc[(data['source'] == ego) | (data['target'] == ego), 'time'].unique()
     #NOTE: later on the time extents would be computed to get the time array, which will fill in the missing timestamps with empty data in between.
-    return data.copy().loc[data['time'].isin(timestamps), :]
+    return data.copy().loc[data['time'].isin(egoTimes), :]
 
-def construct_egocentric_network(ego: str, data: pd.DataFrame) -> pd.DataFrame:
+def construct_egocentric_network(ego: str, data: pd.DataFrame, hopLimit: int = HOP_LIMIT) -> pd.DataFrame:
     """
     Constructs an egocentric network for a given ego node in a given DataFrame of edges.
+    Each time is treated as its own network, where the edges are indexed by (time, source) and (time, target),
+    so that every hop expands the frontiers of all the times at once.
 
     Args:
         ego (str): The ego node for which to construct the egocentric network.
         data (pd.DataFrame): The DataFrame of edges from which to construct the egocentric network.
+        hopLimit (int): The maximum number of hops to include in the egocentric network.
 
     Returns:
         pd.DataFrame: The DataFrame of edges in the egocentric network.
     """
-    HOP_LIMIT = 2  # The maximum number of hops to include in the egocentric network.
-
     data = data.reset_index(drop=True)
-    entities: list[str] = pd.concat([data['source'], data['target']]).unique().tolist()
+    nodes, entities = pd.factorize(pd.concat([data['source'], data['target']]))
     assert ego in entities, "Ego is not found in the data with the given time range."
-    indices = pd.Index([])
-    for _, entries in data.groupby(by='time'):
-        waitlist: set = {ego}
-        hop = 1
-        while len(waitlist) != 0 and hop <= HOP_LIMIT:
-            next_waitlist: list[str] = []
-            for each in waitlist:
-                sources = entries.loc[(data['target'] == each), :]
-                targets = entries.loc[(data['source'] == each), :]
-                candidates: list[str] = pd.concat([sources['source'], targets['target']]).unique().tolist()
-                indices: pd.Index = indices.union(sources.index).union(targets.index)
-                next_waitlist.extend(candidates)
-            waitlist = set(next_waitlist) - set(waitlist)
-            hop += 1
-    # returning the two-hop ego network, proved to be correct
+    egoCode: int = entities.get_loc(ego)
+    numEdges: int = data.shape[0]
+    numEntities: int = len(entities)
+    sources: np.ndarray = nodes[:numEdges]
+    targets: np.ndarray = nodes[numEdges:]
+    times, _ = pd.factorize(data['time'])
+    # An (time, entity) pair is encoded as a single key, and the edges are sorted by the keys of both ends
+    sourceKeys: np.ndarray = times * numEntities + sources
+    targetKeys: np.ndarray = times * numEntities + targets
+    bySource: np.ndarray = np.argsort(sourceKeys, kind='stable')
+    byTarget: np.ndarray = np.argsort(targetKeys, kind='stable')
+    sortedSourceKeys: np.ndarray = sourceKeys[bySource]
+    sortedTargetKeys: np.ndarray = targetKeys[byTarget]
+
+    egoTimes: np.ndarray = np.unique(times[(sources == egoCode) | (targets == egoCode)])
+    waitlist: np.ndarray = egoTimes * numEntities + egoCode
+    visited: np.ndarray = waitlist
+    indices: list[np.ndarray] = []
+    hop = 1
+    while len(waitlist) != 0 and hop <= hopLimit:
+        # edges where the waitlist nodes are the sources, and where they are the targets
+        outgoing: np.ndarray = bySource[_expand_ranges(np.searchsorted(sortedSourceKeys, waitlist, side='left'), np.searchsorted(sortedSourceKeys, waitlist, side='right'))]
+        incoming: np.ndarray = byTarget[_expand_ranges(np.searchsorted(sortedTargetKeys, waitlist, side='left'), np.searchsorted(sortedTargetKeys, waitlist, side='right'))]
+        indices.extend([outgoing, incoming])
+        candidates: np.ndarray = np.unique(np.concatenate([targetKeys[outgoing], sourceKeys[incoming]]))
+        waitlist = np.setdiff1d(candidates, visited, assume_unique=True)
+        visited = np.union1d(visited, waitlist)
+        hop += 1
+    indices: np.ndarray = np.unique(np.concatenate(indices)) if len(indices) != 0 else np.array([], dtype=int)
+    # returning the k-hop ego network
     return data.loc[indices, :]
 
+def _expand_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the ranges [start, end) into one array, e.g., [0, 3) and [5, 7) into [0, 1, 2, 5, 6].
+    """
+    lengths: np.ndarray = ends - starts
+    total: int = lengths.sum()
+    if total == 0: return np.array([], dtype=int)
+    nonempty: np.ndarray = lengths > 0
+    starts, lengths = starts[nonempty], lengths[nonempty]
+    # each element steps by 1 from the previous one, except the first element of every range that jumps to its start
+    steps: np.ndarray = np.ones(total, dtype=int)
+    offsets: np.ndarray = np.cumsum(lengths)[:-1]
+    steps[0] = starts[0]
+    steps[offsets] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+    return np.cumsum(steps)
+
 def _get_entities(grouped_entities):
     return [each[0] for each in list(grouped_entities)]
 
@@ -77,49 +107,50 @@ def _order_within(constraints: list[tuple], entityColor: dict, ascending: bool=T
     return result, sortedEntities
 
 def find_within_constraints(entries: pd.DataFrame, ego: str, entityColor: dict) -> tuple[list[list[dict|str]], list[list[str]]]:
-    raws: list[tuple] = entries.apply(lambda row: tuple(row[['source', 'target', 'weight']]), axis=1).tolist() 
+    raws: list[tuple] = list(zip(entries['source'].tolist(), entries['target'].tolist(), entries['weight'].tolist()))
     constraints = set()
+    # (source, target) -> the weights of the constraints in `constraints`, to find the opposite direction in O(1)
+    directions: dict[tuple, set] = {}
 
     for (source, target, weight) in raws:
-        bidirection: list[tuple] = list(filter(lambda x: x[:2] == (target, source), constraints))
+        bidirection: set = directions.get((target, source), set())
         assert len(bidirection) <= 1, "The provided data should have been aggregated"
         if len(bidirection) == 1: # should behave so because we did drop_duplicates()
-            otherWeight: int = bidirection[0][2]
-            if otherWeight > weight: # overrides
-                constraints.add(bidirection[0])
-                if tuple([source, target, weight]) in constraints: constraints.remove(tuple([source, target, weight]))
+            otherWeight: int = next(iter(bidirection))
+            if otherWeight >= weight: 
+                # overrides, or if two are the same weight, then we ignore their relation constraints
+                if tuple([source, target, weight]) in constraints: 
+                    constraints.remove(tuple([source, target, weight]))
+                    directions[(source, target)].discard(weight)
                 continue
-            if otherWeight == weight: # If two are the same weight, then we ignore their relation constraints
-                if tuple([source, target, weight]) in constraints: constraints.remove(tuple([source, target, weight]))
-                continue 
         constraints.add(tuple([source, target, weight])) # keep this sorting
+        directions.setdefault((source, target), set()).add(weight)
     
     sourceConstraints: list[tuple] = list(filter(lambda x: x[1] == ego, constraints))
     targetConstraints: list[tuple] = list(filter(lambda x: x[0] == ego, constraints))
     sourceGroup, sources = _order_within(sourceConstraints, entityColor, ascending=True)
     targetGroup, targets = _order_within(targetConstraints, entityColor, ascending=False)
     oneHops: list[str] = sources + targets
+    sourceSet, targetSet, oneHopSet = set(sources), set(targets), set(oneHops)
 
     remainedConstraints = list(constraints - set(sourceConstraints) - set(targetConstraints))
     # NOTE: this also enforces the two hop nodes to be ordered by the weight by default
     remainedConstraints.sort(key=lambda x: x[2], reverse=True) # let the weight to determine priority
     twoHopTops = []
     twoHopBottoms = []
-    twoHops = []
+    twoHops = set()
     for (source, target, weight) in remainedConstraints:
-        if source in oneHops and target in oneHops: continue
-        if target in oneHops and source not in oneHops: # source is ego's two-hop neighbor
-            if target in sources: # source -> target -> ego, i.e., this pair should be placed above the ego
-                # (source, target) and (target, ego) should already exists
-                if source not in twoHops: twoHopTops.append(source)
-            elif target in targets: # ego -> target; source -> target; i.e., this pair should be placed below the ego, where source should be pushed further
-                if source not in twoHops: twoHopBottoms.append(source)
-        elif source in oneHops and target not in oneHops: # target is two-hop
-            if source in sources: # source -> ego; source -> target; i.e., this pair should be placed above the ego, where target should be pushed further
-                if target not in twoHops: twoHopTops.append(target)
-            elif source in targets: # ego-> source -> target;
-                if target not in twoHops: twoHopBottoms.append(target)
-        twoHops = twoHopTops + twoHopBottoms
+        # Find out which one is ego's two-hop neighbor and which one is the one-hop neighbor it goes through
+        if target in oneHopSet and source not in oneHopSet: twoHop, oneHop = source, target
+        elif source in oneHopSet and target not in oneHopSet: twoHop, oneHop = target, source
+        else: continue
+        if twoHop in twoHops: continue
+        # e.g., source -> target -> ego or source -> ego; source -> target, i.e., this pair should be placed above the ego
+        if oneHop in sourceSet: twoHopTops.append(twoHop)
+        # e.g., ego -> target; source -> target or ego-> source -> target, i.e., this pair should be placed below the ego, where the two-hop should be pushed further
+        elif oneHop in targetSet: twoHopBottoms.append(twoHop)
+        else: continue
+        twoHops.add(twoHop)
 
     
     order: list[list[str]] = [twoHopTops, sources, [ego], targets, twoHopBottoms] # a.k.a. hops
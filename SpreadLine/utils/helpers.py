@@ -19,6 +19,12 @@ def str_to_datetime(time: str, timeformat: str):
 def datetime_to_str(time: datetime, timeformat: str):
     return time.strftime(timeformat)
 
+def str_to_datetimes(times: pd.Series|list[str], timeformat: str) -> pd.Series|pd.DatetimeIndex:
+    """
+    The vectorized str_to_datetime(), which parses all the times at once.
+    """
+    return pd.to_datetime(times, format=timeformat)
+
 #  Generate the array of dates given the above extents
 def get_time_array(extents: list[str], timeDelta: str, timeformat: str) -> list[str]:
     if timeDelta == 'year':
@@ -27,24 +33,51 @@ def get_time_array(extents: list[str], timeDelta: str, timeformat: str) -> list[
     end = datetime.strptime(extents[1], timeformat)
     if timeDelta == 'month':
         months = (end.year - start.year) * 12 + end.month - start.month
-        return [ datetime_to_str((start + timedelta(months=idx)), timeformat) for idx in range(months + 2) ]
+        # Offsets from the start, so that the day of the month does not drift after a shorter month
+        return [ datetime_to_str((start + pd.DateOffset(months=idx)), timeformat) for idx in range(months + 2) ]
     delta = end - start
     # + 2 means for 10 days we give 11 points back, the last point should not be rendered but helps aggregation
     if timeDelta == 'hour':
         hours, _ = divmod(delta.seconds, 3600)
-        return [ datetime_to_str((start + timedelta(hours=idx)), timeformat) for idx in range(hours + 2) ]
+        return _format_time_range(start, hours + 2, timedelta(hours=1), timeformat)
     if timeDelta == 'week':
         weeks, _ = divmod(delta.days, 7)
-        return [ datetime_to_str((start + timedelta(weeks=idx)), timeformat) for idx in range(weeks + 2) ]
+        return _format_time_range(start, weeks + 2, timedelta(weeks=1), timeformat)
     #NOTE: above are figuratively, it might need updates 
     if timeDelta == 'day':
-        return [ datetime_to_str((start + timedelta(days=idx)), timeformat) for idx in range(delta.days + 2)]
+        return _format_time_range(start, delta.days + 2, timedelta(days=1), timeformat)
     raise KeyError("The given delta is not supported")
 
+def _format_time_range(start: datetime, periods: int, step: timedelta, timeformat: str) -> list[str]:
+    return pd.date_range(start=start, periods=periods, freq=step).strftime(timeformat).tolist()
+
 def _sparse_argsort(arr: np.ndarray) -> np.ndarray:
     """
     Order the array indices based on their value in an ascending order, excluding the zero elements.
     i.e., this returns the sorted entity ids/indices based on their ordering.
     """
     nonzeroIndices = np.nonzero(arr)[0]
-    return nonzeroIndices[np.argsort(arr[nonzeroIndices])]
\ No newline at end of file
+    return nonzeroIndices[np.argsort(arr[nonzeroIndices])]
+
+def _count_inversions(arr: np.ndarray) -> int:
+    """
+    Count the pairs (i, j) where i < j and arr[i] > arr[j], given arr has no duplicates, in O(n log^2 n).
+    Values are replaced by their ranks, and for each bit of the ranks, a pair is an inversion at the highest bit where they differ,
+    i.e., they share the higher bits, and the earlier one has the bit set while the later one does not.
+    """
+    numElements: int = len(arr)
+    if numElements < 2: return 0
+    ranks: np.ndarray = np.empty(numElements, dtype=np.int64)
+    ranks[np.argsort(arr, kind='stable')] = np.arange(numElements)
+    result: int = 0
+    for bit in range(0, int(numElements - 1).bit_length()):
+        prefixes: np.ndarray = ranks >> (bit + 1)
+        bits: np.ndarray = (ranks >> bit) & 1
+        indices: np.ndarray = np.argsort(prefixes, kind='stable') # keeps the sequence order within the same prefix
+        sortedPrefixes, sortedBits = prefixes[indices], bits[indices]
+        counts: np.ndarray = np.cumsum(sortedBits)
+        starts: np.ndarray = np.flatnonzero(np.r_[True, sortedPrefixes[1:] != sortedPrefixes[:-1]])
+        # the number of the earlier ones with the bit set, within the same prefix
+        offsets: np.ndarray = np.repeat(counts[starts] - sortedBits[starts], np.diff(np.r_[starts, numElements]))
+        result += int((counts - offsets)[sortedBits == 0].sum())
+    return result
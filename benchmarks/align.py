@@ -0,0 +1,179 @@
+"""
+Check `longest_common_substring()` against the dictionary-based dynamic programming it replaces, and time both.
+Check `_compute_rewards()` against the per-entity loop it replaces as well.
+
+Run from the repository root:
+    python -m benchmarks.align
+    python -m benchmarks.align --trials 3000 --size 400 --seed 1
+
+Both align the same seeded random reward matrices, with float, integer-tied (many equal candidates), and inf entries.
+Only positive inf is drawn, which is the only one `_compute_rewards()` produces, since mixing both gives NaN in either.
+The rewards are compared on small seeded random networks, see `benchmarks.synthetic.synthetic_network()`, where some relations to the ego
+are reversed with a larger weight, so that the contact sessions list those entities twice.
+Exits with 1 if any alignment or any reward differs.
+"""
+import argparse
+import sys
+import time
+import math
+import numpy as np
+import pandas as pd
+
+from SpreadLine.spreadline import SpreadLine
+from SpreadLine.align import longest_common_substring, _compute_rewards, ALPHA
+from SpreadLine.order import ordering
+from benchmarks.synthetic import synthetic_network, EGO
+
+KINDS = ['float', 'tied', 'inf']
+
+
+def _reference_longest_common_substring(currLength: int, nextLength: int, reward) -> dict:
+    """The previous implementation, which fills dictionaries of dictionaries cell by cell."""
+    matchTable = {} # default is 0
+    # Initialization
+    for i in range(0, currLength):
+        matchTable[i] = {}
+        for j in range(0, nextLength):
+            matchTable[i][j] = 0
+    # memoization
+    direction = {}
+    for i in range(0, currLength):
+        direction[i] = {}
+        for j in range(0, nextLength):
+            candidates = [
+                matchTable.get(i-1, {}).get(j-1, 0) + reward[i, j], # i and j should be aligned
+                matchTable.get(i, {}).get(j-1, 0), # i should not align with j, so maybe try j - 1, i.e., left goes up
+                matchTable.get(i-1, {}).get(j, 0)  # j should not align with i, so maybe try i - 1, i.e., right goes up
+            ]
+            maxValue = max(candidates)
+            maxIdx = candidates.index(maxValue)
+            matchTable[i][j] = maxValue
+            direction[i][j] = maxIdx
+
+    alignTable: dict = {}
+    currPtr: int = currLength - 1
+    nextPtr: int = nextLength - 1
+    while (currPtr >= 0 and nextPtr >= 0):
+        if (direction[currPtr][nextPtr] == 0): # aligned
+            alignTable[currPtr] = nextPtr
+            currPtr -= 1
+            nextPtr -= 1
+        elif (direction[currPtr][nextPtr] == 1):
+            nextPtr -= 1 # this entity in nextTime is not aligning with anyone
+        elif (direction[currPtr][nextPtr] == 2):
+            currPtr -= 1 # this entity in currentTime is not aligning with anyone
+        else:
+            break
+    return alignTable
+
+def _reference_compute_rewards(liner, orderedEntities, orderedIdleEntities) -> list[np.ndarray]:
+    """The previous implementation, which looks up the sessions of every pair of entities."""
+    (_, numTimestamps) = liner.span
+    rewards: list[np.ndarray] = []
+    ego = liner.egoIdx
+    for cIdx in range(0, numTimestamps-1):
+        currentReward: list[list[int]] = [] # (numCurrentEntities, numNextEntities)
+        currentEntities: list[int] = orderedEntities[cIdx] # the indices of the entities
+        nextEntities: list[int] = orderedEntities[cIdx + 1]
+        for currOrder, currEnt in enumerate(currentEntities):
+            currEntReward: list[int] = []
+            for nextOrder, nextEnt in enumerate(nextEntities):
+                reward = 0
+                currSessionEntIds: list[int] = _reference_get_entities_in_session(currEnt, cIdx, liner, orderedIdleEntities[cIdx])
+                nextSessionEntIds: list[int] = _reference_get_entities_in_session(nextEnt, cIdx+1, liner, orderedIdleEntities[cIdx + 1])
+                # straight(l_i, r_j), the maximum number of staight lines we can get from these two sessions
+                num_straight_lines = np.in1d(currSessionEntIds, nextSessionEntIds).sum()
+                reward += num_straight_lines
+                # similarity of the relative order
+                compatibility = ALPHA * (1 - np.abs(
+                    ((currOrder + 1) / len(currSessionEntIds)) -  # + 1 because starts at 0
+                    ((nextOrder + 1) / len(nextSessionEntIds))
+                ))
+                reward += compatibility
+                if currEnt == ego and nextEnt == ego: reward = math.inf
+                currEntReward.append(reward)
+            currentReward.append(currEntReward)
+        rewards.append(np.array(currentReward, dtype=float))
+    return rewards
+
+def _reference_get_entities_in_session(rIdx: int, cIdx: int, liner, orderedIdleEntities) -> list[int]:
+    sessionID = liner.entities[rIdx].getAtTimestamp(cIdx)
+    if sessionID in liner.locations.get('idle'): return orderedIdleEntities
+    return liner.getSessionByID(sessionID).getEntityIDs()
+
+def random_network(seed: int) -> pd.DataFrame:
+    """Returns a small random network, where about half of the relations towards the ego are followed by their reverse with a larger weight."""
+    rng = np.random.default_rng(seed)
+    network: pd.DataFrame = synthetic_network(int(rng.integers(10, 40)), int(rng.integers(3, 8)), degree=3, seed=seed)
+    towards: pd.DataFrame = network.loc[(network['target'] == EGO) & (rng.random(len(network)) < 0.5), :]
+    reverse = pd.DataFrame({'source': EGO, 'target': towards['source'], 'time': towards['time'], 'weight': towards['weight'] + 1})
+    return pd.concat([network, reverse], ignore_index=True).drop_duplicates(subset=['source', 'target', 'time'], ignore_index=True)
+
+def check_rewards(trials: int = 50, seed: int = 0) -> tuple[int, int, list[int]]:
+    """Returns the number of timestamp pairs, the number of contact sessions that list an entity twice, and the trials whose rewards differ."""
+    numPairs, numDuplicated, mismatches = 0, 0, []
+    for trial in range(0, trials):
+        liner = SpreadLine()
+        liner.load(random_network(seed + trial), config={'source': 'source', 'target': 'target', 'time': 'time', 'weight': 'weight'})
+        liner.center(EGO)
+        _, orderedEntities, orderedIdleEntities, _, _ = ordering(liner, iteration=liner._config.get('sweepIterations'))
+        rewards: list[np.ndarray] = _compute_rewards(liner, orderedEntities, orderedIdleEntities)
+        expected: list[np.ndarray] = _reference_compute_rewards(liner, orderedEntities, orderedIdleEntities)
+        numPairs += len(expected)
+        numDuplicated += sum([len(session.getEntityIDs()) != len(set(session.getEntityIDs())) for session in liner.sessions])
+        if len(rewards) != len(expected) or not all([np.array_equal(each, other) for each, other in zip(rewards, expected)]): mismatches.append(trial)
+    return numPairs, numDuplicated, mismatches
+
+def random_reward(rng: np.random.Generator, currLength: int, nextLength: int, kind: str) -> np.ndarray:
+    """Returns a random (currLength, nextLength) reward matrix, with some negative entries as the penalties."""
+    if kind == 'float': return rng.normal(0.2, 1, (currLength, nextLength))
+    if kind == 'tied': return rng.integers(-1, 3, (currLength, nextLength)).astype(float)
+    if kind == 'inf':
+        reward: np.ndarray = rng.integers(-1, 3, (currLength, nextLength)).astype(float)
+        reward[rng.random((currLength, nextLength)) < 0.1] = np.inf # as the ego is rewarded to align with itself
+        return reward
+    raise KeyError(f"Unknown kind: {kind}")
+
+def check_equivalence(trials: int = 1000, maxLength: int = 12, seed: int = 0) -> list[tuple]:
+    """Returns the (kind, currLength, nextLength, trial) of every reward matrix whose alignments differ."""
+    rng = np.random.default_rng(seed)
+    mismatches: list[tuple] = []
+    for trial in range(0, trials):
+        kind: str = KINDS[trial % len(KINDS)]
+        currLength, nextLength = rng.integers(1, maxLength + 1, 2)
+        reward: np.ndarray = random_reward(rng, currLength, nextLength, kind)
+        if longest_common_substring(currLength, nextLength, reward) != _reference_longest_common_substring(currLength, nextLength, reward):
+            mismatches.append((kind, int(currLength), int(nextLength), trial))
+    return mismatches
+
+def time_alignment(size: int, seed: int = 0) -> dict:
+    reward: np.ndarray = random_reward(np.random.default_rng(seed), size, size, 'float')
+    times: dict = {}
+    for name, func in [('time', longest_common_substring), ('baselineTime', _reference_longest_common_substring)]:
+        startTime: float = time.perf_counter()
+        func(size, size, reward)
+        times[name] = time.perf_counter() - startTime
+    return times
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check and time the alignment between the entities of two timestamps.")
+    parser.add_argument('--trials', type=int, default=3000, help="The number of random reward matrices")
+    parser.add_argument('--max-length', type=int, default=12, help="The maximal number of entities per timestamp")
+    parser.add_argument('--size', type=int, default=400, help="The number of entities per timestamp of the timed alignment")
+    parser.add_argument('--networks', type=int, default=50, help="The number of random networks whose rewards are compared")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    mismatches: list[tuple] = check_equivalence(args.trials, args.max_length, args.seed)
+    for (kind, currLength, nextLength, trial) in mismatches:
+        print(f"Differs: {kind} {currLength}x{nextLength} (trial {trial})")
+    print(f"Identical: {args.trials - len(mismatches)} of {args.trials} reward matrices")
+    numPairs, numDuplicated, rewardMismatches = check_rewards(args.networks, args.seed)
+    for trial in rewardMismatches: print(f"Differs: the rewards of network {trial}")
+    print(f"Identical rewards: {args.networks - len(rewardMismatches)} of {args.networks} networks ({numPairs} timestamp pairs, {numDuplicated} sessions listing an entity twice)")
+    times: dict = time_alignment(args.size, args.seed)
+    print(f"{args.size}x{args.size}: {times['baselineTime']:.3f}s -> {times['time']:.3f}s")
+    return 0 if len(mismatches) == 0 and len(rewardMismatches) == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Benchmark the node contexts aggregated from the citations of the vis-author case study, see `aggregate_citations()` of the demo.
+
+Run from the repository root:
+    python -m benchmarks.citations
+    python -m benchmarks.citations --repeat 5 --output report.json
+
+Every paper in the full citations file is aggregated at once, and then the papers of each ego.
+The per-paper loop that it replaces is timed as well, which also checks that both produce the same node contexts.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from benchmarks.run import CASE_STUDIES, _get_meta
+from networks import aggregate_citations # the demo backend is on the path once benchmarks.run is imported
+
+EGOS = ['Jeffrey Heer', 'Tamara Munzner']
+
+
+def _aggregate_per_paper(citations: pd.DataFrame, papers: list[str]) -> pd.DataFrame:
+    frames = []
+    for paper in papers:
+        group = citations.loc[citations['paperID'] == paper, :]
+        for idx, row in group.iterrows():
+            frames.append({'entity': row['name'], 'time': str(row['year']), 'context': int(row['citationcount'])})
+    return pd.DataFrame(frames).groupby(['entity', 'time']).agg({'context': 'sum'}).reset_index()
+
+def _time(func, repeat: int) -> tuple[list[float], pd.DataFrame]:
+    times: list[float] = []
+    for _ in range(0, max(repeat, 1)):
+        startTime: float = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - startTime)
+    return times, result
+
+def benchmark_papers(citations: pd.DataFrame, papers: list[str], repeat: int = 3, baseline: bool = True) -> dict:
+    times, result = _time(lambda: aggregate_citations(citations, papers), repeat)
+    report: dict = {'numPapers': len(papers), 'numContexts': len(result), 'time': min(times), 'medianTime': float(np.median(times))}
+    if baseline:
+        # The per-paper loop is slow, so it is only run once
+        baselineTimes, expected = _time(lambda: _aggregate_per_paper(citations, papers), 1)
+        report.update({'baselineTime': baselineTimes[0], 'speedup': baselineTimes[0] / min(times), 'identical': bool(result.equals(expected))})
+    return report
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the aggregation of the citations into node contexts.")
+    parser.add_argument('--repeat', type=int, default=3, help="The number of timed runs")
+    parser.add_argument('--no-baseline', action='store_true', help="Skip the per-paper loop")
+    parser.add_argument('--output', default=None, help="The path of the JSON report, printed if not specified")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(CASE_STUDIES, 'vis-author')
+    citations = pd.read_csv(os.path.join(path, 'citations.csv'))
+    relations = pd.read_csv(os.path.join(path, 'relations.csv'))
+    report = {'meta': _get_meta(), 'repeat': args.repeat, 'numCitations': len(citations), 'cases': {}}
+    cases: dict = {'all': citations['paperID'].unique().tolist()}
+    for ego in EGOS:
+        cases[ego] = relations.loc[(relations['source'] == ego) | (relations['target'] == ego), 'id'].unique().tolist()
+    for name, papers in cases.items():
+        report['cases'][name] = benchmark_papers(citations, papers, repeat=args.repeat, baseline=not args.no_baseline)
+        print(f"{name}: {report['cases'][name]['time']:.4f}s", file=sys.stderr)
+    if args.output is None: print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
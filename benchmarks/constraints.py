@@ -0,0 +1,97 @@
+"""
+Check and time `find_within_constraints()` on a hub ego, which takes part in thousands of relations at one timestamp.
+
+Run from the repository root:
+    python -m benchmarks.constraints
+    python -m benchmarks.constraints --neighbors 4000 --two-hops 4000 --repeat 5
+
+The relations come from `benchmarks.synthetic.hub_network()`. The previous implementation, which scans the constraints for the
+opposite direction of every relation, is timed as well (once, since it is quadratic), and both have to return the same hops.
+The synthetic cases of `benchmarks.run` rarely have more than a few relations per ego and timestamp, so they do not exercise this.
+Exits with 1 if the hops differ.
+"""
+import argparse
+import sys
+import time
+import pandas as pd
+
+from SpreadLine.utils.constructors import find_within_constraints, _order_within
+from benchmarks.synthetic import hub_network, EGO
+
+
+def _reference_find_within_constraints(entries: pd.DataFrame, ego: str, entityColor: dict) -> tuple[list[list[dict|str]], list[list[str]]]:
+    """The previous implementation."""
+    raws: list[tuple] = entries.apply(lambda row: tuple(row[['source', 'target', 'weight']]), axis=1).tolist() 
+    constraints = set()
+
+    for (source, target, weight) in raws:
+        bidirection: list[tuple] = list(filter(lambda x: x[:2] == (target, source), constraints))
+        assert len(bidirection) <= 1, "The provided data should have been aggregated"
+        if len(bidirection) == 1: # should behave so because we did drop_duplicates()
+            otherWeight: int = bidirection[0][2]
+            if otherWeight > weight: # overrides
+                constraints.add(bidirection[0])
+                if tuple([source, target, weight]) in constraints: constraints.remove(tuple([source, target, weight]))
+                continue
+            if otherWeight == weight: # If two are the same weight, then we ignore their relation constraints
+                if tuple([source, target, weight]) in constraints: constraints.remove(tuple([source, target, weight]))
+                continue 
+        constraints.add(tuple([source, target, weight])) # keep this sorting
+    
+    sourceConstraints: list[tuple] = list(filter(lambda x: x[1] == ego, constraints))
+    targetConstraints: list[tuple] = list(filter(lambda x: x[0] == ego, constraints))
+    sourceGroup, sources = _order_within(sourceConstraints, entityColor, ascending=True)
+    targetGroup, targets = _order_within(targetConstraints, entityColor, ascending=False)
+    oneHops: list[str] = sources + targets
+
+    remainedConstraints = list(constraints - set(sourceConstraints) - set(targetConstraints))
+    remainedConstraints.sort(key=lambda x: x[2], reverse=True) # let the weight to determine priority
+    twoHopTops = []
+    twoHopBottoms = []
+    twoHops = []
+    for (source, target, weight) in remainedConstraints:
+        if source in oneHops and target in oneHops: continue
+        if target in oneHops and source not in oneHops: # source is ego's two-hop neighbor
+            if target in sources:
+                if source not in twoHops: twoHopTops.append(source)
+            elif target in targets:
+                if source not in twoHops: twoHopBottoms.append(source)
+        elif source in oneHops and target not in oneHops: # target is two-hop
+            if source in sources:
+                if target not in twoHops: twoHopTops.append(target)
+            elif source in targets:
+                if target not in twoHops: twoHopBottoms.append(target)
+        twoHops = twoHopTops + twoHopBottoms
+
+    order: list[list[str]] = [twoHopTops, sources, [ego], targets, twoHopBottoms] # a.k.a. hops
+    result: list[list[dict|str]] = [twoHopTops, sourceGroup, [ego], targetGroup, twoHopBottoms]
+    return result, order
+
+def _time(func, repeat: int) -> tuple[list[float], tuple]:
+    times: list[float] = []
+    for _ in range(0, max(repeat, 1)):
+        startTime: float = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - startTime)
+    return times, result
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check and time the constraints within a session of a hub ego.")
+    parser.add_argument('--neighbors', type=int, default=4000, help="The number of one-hop neighbors of the ego")
+    parser.add_argument('--two-hops', type=int, default=4000, help="The number of relations between one-hop and two-hop neighbors")
+    parser.add_argument('--repeat', type=int, default=3, help="The number of timed runs")
+    parser.add_argument('--no-baseline', action='store_true', help="Skip the previous implementation")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    entries: pd.DataFrame = hub_network(args.neighbors, args.two_hops, args.seed)
+    times, result = _time(lambda: find_within_constraints(entries, EGO, {}), args.repeat)
+    print(f"{len(entries)} relations: {min(times):.4f}s")
+    if args.no_baseline: return 0
+    baselineTimes, expected = _time(lambda: _reference_find_within_constraints(entries, EGO, {}), 1)
+    identical: bool = result == expected
+    print(f"previous: {baselineTimes[0]:.4f}s ({baselineTimes[0] / min(times):.0f}x), identical: {identical}")
+    return 0 if identical else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Check the time to import SpreadLine against a budget, which every worker process and script pays before computing anything.
+
+Run from the repository root:
+    python -m benchmarks.imports
+    python -m benchmarks.imports --budget 1.0 --repeat 5
+
+Each import runs in a fresh interpreter. Exits with 1 if the minimum time exceeds the budget,
+or if the import loads any of the heavy optional dependencies, i.e., `DEFERRED`, which are imported once needed.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.run import ROOT
+
+MODULE = 'SpreadLine.spreadline'
+DEFERRED = ['sklearn', 'scipy']
+DEFAULT_BUDGET = 1.0 # seconds
+
+_SCRIPT = """
+import json, sys, time
+startTime = time.perf_counter()
+import {module}
+duration = time.perf_counter() - startTime
+print(json.dumps({{'time': duration, 'modules': sorted(set([name.split('.')[0] for name in sys.modules]))}}))
+"""
+
+def measure_import(module: str = MODULE) -> dict:
+    """Returns the seconds to import the module in a fresh interpreter, and the top-level modules loaded by then."""
+    output = subprocess.run([sys.executable, '-c', _SCRIPT.format(module=module)], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the time to import SpreadLine.")
+    parser.add_argument('--module', default=MODULE, help="The module to import")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="The maximal seconds to import")
+    parser.add_argument('--repeat', type=int, default=3, help="The number of fresh interpreters")
+    args = parser.parse_args(argv)
+
+    results: list[dict] = [measure_import(args.module) for _ in range(0, max(args.repeat, 1))]
+    duration: float = min([each['time'] for each in results])
+    loaded: list[str] = [name for name in DEFERRED if name in results[0]['modules']]
+    print(f"import {args.module}: {duration:.3f}s (budget {args.budget:.3f}s)")
+    if len(loaded) > 0: print(f"Imported {', '.join(loaded)}, which should only be imported once needed")
+    return 0 if duration <= args.budget and len(loaded) == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
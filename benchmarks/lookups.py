@@ -0,0 +1,112 @@
+"""
+Benchmark the session and entity lookups of SpreadLine, i.e., `getSessionByID()`, `getEntityByName()`, and `getEntityIndexByName()`.
+
+Run from the repository root:
+    python -m benchmarks.lookups
+    python -m benchmarks.lookups --cases heer munzner --repeat 5 --output report.json
+
+The lookups made while fitting each case are recorded, and then repeated on the fitted SpreadLine with the indexed lookups and with the linear scans
+that they replace. Each case is also fitted with either, which checks that both produce the same rendered result. The cases are the same as `benchmarks.run`.
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+
+from SpreadLine.spreadline import SpreadLine
+from benchmarks.run import build_case, _get_meta
+from benchmarks.regression import digest_render
+
+LOOKUPS = ['getSessionByID', 'getEntityByName', 'getEntityIndexByName']
+
+
+class _LinearSpreadLine(SpreadLine):
+    """The lookups before they were indexed, which scan the sessions and the entities."""
+    def getSessionByID(self, ID: int):
+        for each in self.sessions:
+            if each.id == ID: return each
+        return None
+
+    def getEntityByName(self, name: str):
+        for each in self.entities:
+            if each.name == name: return each
+        return None
+
+    def getEntityIndexByName(self, name: str) -> int:
+        if name not in self.entities_names: return -1
+        return self.entities_names.index(name)
+
+def _record_lookups(cls: type) -> tuple[type, list]:
+    """Returns a subclass of `cls` that records the name and the arguments of every lookup."""
+    calls: list[tuple[str, tuple]] = []
+    def _recorded(name: str):
+        lookup = getattr(cls, name)
+        def wrapper(self, *args):
+            calls.append((name, args))
+            return lookup(self, *args)
+        return wrapper
+    return type(f'Recorded{cls.__name__}', (cls,), {name: _recorded(name) for name in LOOKUPS}), calls
+
+def fit_case(case: dict, cls: type) -> tuple[float, SpreadLine, dict]:
+    """Returns the seconds of `.center()` and `.fit()`, where the lookups are used, the fitted SpreadLine, and the rendered result."""
+    liner = cls()
+    case['load'](liner)
+    startTime: float = time.perf_counter()
+    case['center'](liner)
+    liner.configure(case['config'])
+    width, height = case['size']
+    result = liner.fit(width=width, height=height)
+    return time.perf_counter() - startTime, liner, result
+
+def replay_lookups(liner: SpreadLine, calls: list[tuple[str, tuple]], cls: type, repeat: int = 3) -> list[float]:
+    """Returns the seconds to repeat the recorded lookups on the fitted SpreadLine, with the lookups of `cls`."""
+    lookups: list = [(getattr(cls, name), args) for (name, args) in calls]
+    times: list[float] = []
+    for _ in range(0, max(repeat, 1)):
+        startTime: float = time.perf_counter()
+        for lookup, args in lookups: lookup(liner, *args)
+        times.append(time.perf_counter() - startTime)
+    return times
+
+def benchmark_case(case: dict, repeat: int = 3) -> dict:
+    recordedClass, calls = _record_lookups(SpreadLine)
+    _, liner, result = fit_case(case, recordedClass)
+    lookupTimes: list[float] = replay_lookups(liner, calls, SpreadLine, repeat)
+    baselineLookupTimes: list[float] = replay_lookups(liner, calls, _LinearSpreadLine, repeat)
+    fitTimes: list[float] = [fit_case(case, SpreadLine)[0] for _ in range(0, max(repeat, 1))]
+    baselineFitTimes: list[float] = []
+    for _ in range(0, max(repeat, 1)):
+        duration, _, expected = fit_case(case, _LinearSpreadLine)
+        baselineFitTimes.append(duration)
+    return {
+        'lookups': {name: sum([each == name for (each, _) in calls]) for name in LOOKUPS},
+        'lookupTime': min(lookupTimes),
+        'baselineLookupTime': min(baselineLookupTimes),
+        'lookupSpeedup': min(baselineLookupTimes) / min(lookupTimes),
+        'fitTime': min(fitTimes),
+        'medianFitTime': float(np.median(fitTimes)),
+        'baselineFitTime': min(baselineFitTimes),
+        'fitSpeedup': min(baselineFitTimes) / min(fitTimes),
+        'identical': digest_render(result) == digest_render(expected),
+    }
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the session and entity lookups of SpreadLine.")
+    parser.add_argument('--cases', nargs='+', default=['heer'], help="metoo, heer, munzner, or synthetic-{numEntities}x{numTimestamps}x{degree}")
+    parser.add_argument('--repeat', type=int, default=3, help="The number of timed runs per case and per lookup")
+    parser.add_argument('--output', default=None, help="The path of the JSON report, printed if not specified")
+    args = parser.parse_args(argv)
+
+    report = {'meta': _get_meta(), 'repeat': args.repeat, 'cases': {}}
+    for name in args.cases:
+        report['cases'][name] = benchmark_case(build_case(name), repeat=args.repeat)
+        each: dict = report['cases'][name]
+        print(f"{name}: {sum(each['lookups'].values())} lookups {each['baselineLookupTime'] * 1e3:.2f}ms -> {each['lookupTime'] * 1e3:.2f}ms ({each['lookupSpeedup']:.1f}x), "
+              f"fit {each['baselineFitTime']:.3f}s -> {each['fitTime']:.3f}s ({each['fitSpeedup']:.2f}x)", file=sys.stderr)
+    if args.output is None: print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Check that the rendered layouts stay the same, e.g., before and after optimizing the renderer.
+
+Run from the repository root:
+    python -m benchmarks.regression --save reference.json
+    python -m benchmarks.regression --check reference.json
+
+The reference records a digest of each part of the rendered result, e.g., "blocks" and "storylines", per case,
+where the cases are the same as `benchmarks.run`. Exits with 1 if any part of any case differs from the reference.
+The layouts depend on the iteration order of sets of names, so the cases are always rendered with `HASH_SEED` as PYTHONHASHSEED.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.run import DEFAULT_CASES, build_case, run_pipeline, _get_meta
+
+IGNORED = ['ordering'] # the sweeping statistics, which do not affect the layout
+HASH_SEED = '0'
+
+
+def _to_json(value):
+    if hasattr(value, 'tolist'): return value.tolist()
+    return str(value)
+
+def digest_render(result: dict) -> dict:
+    """Returns the digest and the number of elements (if it is a list) of each part of the rendered result."""
+    digests: dict = {}
+    for key, value in result.items():
+        if key in IGNORED: continue
+        serialized: str = json.dumps(value, sort_keys=True, default=_to_json)
+        digests[key] = {'digest': hashlib.sha256(serialized.encode()).hexdigest(), 'size': len(value) if isinstance(value, list) else None}
+    return digests
+
+def render_case(name: str) -> dict:
+    _, result = run_pipeline(build_case(name), lambda stage, func: func(), lambda event: None)
+    return digest_render(result)
+
+def compare_digests(reference: dict, current: dict) -> list[str]:
+    """Returns the parts that differ, as "case: part"."""
+    differences: list[str] = []
+    for name, parts in current.items():
+        if name not in reference: continue
+        for key in sorted(set(parts.keys()) | set(reference[name].keys())):
+            if parts.get(key) != reference[name].get(key): differences.append(f"{name}: {key}")
+    return differences
+
+def main(argv: list[str] = None) -> int:
+    if os.environ.get('PYTHONHASHSEED') != HASH_SEED:
+        argv = sys.argv[1:] if argv is None else argv
+        return subprocess.run([sys.executable, '-m', 'benchmarks.regression', *argv], env={**os.environ, 'PYTHONHASHSEED': HASH_SEED}).returncode
+    parser = argparse.ArgumentParser(description="Check that the rendered layouts stay the same.")
+    parser.add_argument('--cases', nargs='+', default=DEFAULT_CASES, help="metoo, heer, munzner, or synthetic-{numEntities}x{numTimestamps}x{degree}")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--save', metavar='REFERENCE', help="Record the reference")
+    group.add_argument('--check', metavar='REFERENCE', help="Compare against the reference")
+    args = parser.parse_args(argv)
+
+    current: dict = {}
+    for name in args.cases:
+        current[name] = render_case(name)
+        print(f"{name}: rendered", file=sys.stderr)
+    if args.save:
+        with open(args.save, 'w') as f: json.dump({'meta': _get_meta(), 'cases': current}, f, indent=2)
+        return 0
+
+    with open(args.check, 'r') as f: reference = json.load(f)['cases']
+    missing: list[str] = [name for name in current if name not in reference]
+    if len(missing) > 0: print(f"Not in the reference: {', '.join(missing)}")
+    differences: list[str] = compare_digests(reference, current)
+    for each in differences: print(f"Different: {each}")
+    if len(differences) == 0: print(f"Identical: {len(current) - len(missing)} cases")
+    return 1 if len(differences) > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
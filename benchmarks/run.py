@@ -0,0 +1,206 @@
+"""
+Benchmark each stage of the SpreadLine pipeline on the bundled case studies and on synthetic ego networks.
+
+Run from the repository root:
+    python -m benchmarks.run --output report.json
+    python -m benchmarks.run --cases metoo synthetic-1000x30x4 --repeat 5 --output report.json
+    python -m benchmarks.run --compare before.json after.json
+
+Synthetic cases are named "synthetic-{numEntities}x{numTimestamps}x{degree}", see `benchmarks.synthetic.synthetic_network()`.
+The report records the wall time (the minimum and the median over the repeats) and the peak memory (from a separate traced run) per stage.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE_STUDIES = os.path.join(ROOT, 'case-studies')
+sys.path.insert(0, os.path.join(ROOT, 'demo', 'backend')) # the author networks are constructed the same way as the demo
+
+from SpreadLine.spreadline import SpreadLine
+from SpreadLine.instrument import STAGES as FIT_STAGES
+from SpreadLine.metrics import evaluate
+from benchmarks.synthetic import synthetic_network, EGO
+
+STAGES = ['load', 'center'] + FIT_STAGES
+DEFAULT_CASES = ['metoo', 'heer', 'munzner', 'synthetic-200x20x4', 'synthetic-1000x30x4']
+
+
+def _metoo_case() -> dict:
+    path = os.path.join(CASE_STUDIES, 'metoo')
+    relations = pd.read_csv(os.path.join(path, 'relations.csv'))
+    relations['weight'] = relations['ID'].str.count(',') + 1
+    entities = pd.read_csv(os.path.join(path, 'entities.csv'))
+    nodeContext = pd.read_csv(os.path.join(path, 'color.csv'))
+    layout = pd.read_csv(os.path.join(path, 'layout.csv'))
+
+    def load(liner: SpreadLine):
+        liner.load(relations.copy(), config={'source': 'Source', 'target': 'Target', 'time': 'Time', 'weight': 'weight'})
+        liner.load(entities.copy(), config={'entity': 'entity', 'color': 'color'}, key='line')
+        liner.load(nodeContext.copy(), config={'time': 'date', 'entity': 'entity', 'context': 'attitude'}, key='node')
+        liner.load(layout.copy(), config={'timestamp': 'time', 'id': 'name', 'posX': 'posX', 'posY': 'posY'}, key='content')
+
+    return {
+        'load': load,
+        'center': lambda liner: liner.center(ego='Danny Masterson'),
+        'config': {'squeezeSameCategory': True, 'bandStretch': [['2023-09-07', '2023-09-10'], ['2023-09-17', '2023-09-19']], 'minimize': 'line'},
+        'size': (2600, 500),
+    }
+
+def _author_case(ego: str, folder: str, weight: str, size: tuple) -> dict:
+    import views
+    path = os.path.join(CASE_STUDIES, 'vis-author')
+    remap = views._remap_JH_affiliation if folder == 'Heer' else views._remap_TM_affiliation
+    network, lineColor, groups = views._construct_author_network(ego, remap, relationsPath=os.path.join(path, 'relations.csv'),
+                                                                 entitiesPath=os.path.join(path, 'entities.csv'))
+    nodeContent = views.aggregate_citations(pd.read_csv(os.path.join(path, 'citations.csv')), network['id'].unique())
+    layout = pd.read_csv(os.path.join(path, folder, 'content.csv'))
+
+    def load(liner: SpreadLine):
+        liner.load(network.copy(), config={'source': 'source', 'target': 'target', 'time': 'year', 'weight': weight})
+        liner.load(lineColor.copy(), config={'entity': 'entity', 'color': 'color'}, key='line')
+        liner.load(nodeContent.copy(), config={'time': 'time', 'entity': 'entity', 'context': 'context'}, key='node')
+        liner.load(layout.copy(), config={'timestamp': 'year', 'id': 'name', 'posX': 'posX', 'posY': 'posY'}, key='content')
+
+    return {
+        'load': load,
+        'center': lambda liner: liner.center(ego=ego, timeDelta='year', timeFormat='%Y', groups=groups),
+        'config': {'squeezeSameCategory': True, 'minimize': 'wiggles'},
+        'size': size,
+    }
+
+def _synthetic_case(numEntities: int, numTimestamps: int, degree: int) -> dict:
+    network = synthetic_network(numEntities, numTimestamps, degree)
+    return {
+        'load': lambda liner: liner.load(network.copy(), config={'source': 'source', 'target': 'target', 'time': 'time', 'weight': 'weight'}),
+        'center': lambda liner: liner.center(ego=EGO),
+        'config': {},
+        'size': (1400, 500),
+        'params': {'numEntities': numEntities, 'numTimestamps': numTimestamps, 'degree': degree, 'numRelations': len(network)},
+    }
+
+def build_case(name: str) -> dict:
+    """Prepare the data of a case, which is excluded from the measurements."""
+    if name == 'metoo': return _metoo_case()
+    if name == 'heer': return _author_case('Jeffrey Heer', 'Heer', 'count', (2800, 1000))
+    if name == 'munzner': return _author_case('Tamara Munzner', 'Munzner', 'citationcount', (2700, 1000))
+    if name.startswith('synthetic-'):
+        numEntities, numTimestamps, degree = [int(each) for each in name[len('synthetic-'):].split('x')]
+        return _synthetic_case(numEntities, numTimestamps, degree)
+    raise KeyError(f"Unknown case: {name}")
+
+
+def run_pipeline(case: dict, measure, hook) -> tuple[SpreadLine, dict]:
+    """
+    Run the pipeline, where `measure(stage, func)` runs and measures "load" and "center", 
+    and `hook` receives the events of the stages in `.fit()`, see `SpreadLine.add_hook()`.
+    Returns the fitted SpreadLine and the rendered result.
+    """
+    liner = SpreadLine()
+    liner.add_hook(hook)
+    measure('load', lambda: case['load'](liner))
+    measure('center', lambda: case['center'](liner))
+    liner.configure(case['config'])
+    width, height = case['size']
+    result = liner.fit(width=width, height=height)
+    return liner, result
+
+def benchmark_case(case: dict, repeat: int = 3, memory: bool = True) -> dict:
+    """
+    Measure the wall time of each stage over `repeat` runs, and the peak memory of each stage in one more run traced by tracemalloc.
+    The peak memory is the highest traced memory during the stage, over the memory traced when the stage started.
+    """
+    times: dict = {stage: [] for stage in STAGES}
+    def _timed(stage: str, func):
+        startTime: float = time.perf_counter()
+        result = func()
+        times[stage].append(time.perf_counter() - startTime)
+        return result
+    def _record_time(event: dict):
+        if event['event'] == 'end': times[event['stage']].append(event['duration'])
+    for _ in range(0, max(repeat, 1)):
+        liner, result = run_pipeline(case, _timed, _record_time)
+
+    peaks: dict = {}
+    def _traced(stage: str, func):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        result = func()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - current
+        return result
+    def _record_memory(event: dict):
+        if event['event'] == 'end': peaks[event['stage']] = event['memory']['peak']
+    if memory:
+        tracemalloc.start() # the stages in `.fit()` are traced as well once tracemalloc is tracing
+        try: run_pipeline(case, _traced, _record_memory)
+        finally: tracemalloc.stop()
+
+    stages: dict = {}
+    for stage in STAGES:
+        stages[stage] = {'time': min(times[stage]), 'medianTime': float(np.median(times[stage])), 'peakMemory': peaks.get(stage)}
+    return {
+        'params': case.get('params', {}),
+        'span': list(liner.span),
+        'stages': stages,
+        'total': sum([each['time'] for each in stages.values()]),
+        'ordering': result['ordering'],
+        'metrics': evaluate(liner),
+    }
+
+def _get_meta() -> dict:
+    try: commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+def compare_reports(before: dict, after: dict):
+    """Print the time of each stage in both reports, for the cases in both, and the speedup of the latter."""
+    print(f"{'case':<24}{'stage':<18}{'before (s)':>12}{'after (s)':>12}{'speedup':>10}")
+    for name, case in after['cases'].items():
+        if name not in before['cases']: continue
+        for stage in STAGES + ['total']:
+            previous = before['cases'][name]['stages'][stage]['time'] if stage != 'total' else before['cases'][name]['total']
+            current = case['stages'][stage]['time'] if stage != 'total' else case['total']
+            speedup = previous / current if current > 0 else float('inf')
+            print(f"{name:<24}{stage:<18}{previous:>12.4f}{current:>12.4f}{speedup:>9.2f}x")
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the SpreadLine pipeline.")
+    parser.add_argument('--cases', nargs='+', default=DEFAULT_CASES, help="metoo, heer, munzner, or synthetic-{numEntities}x{numTimestamps}x{degree}")
+    parser.add_argument('--repeat', type=int, default=3, help="The number of timed runs per case")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced run that measures the peak memory")
+    parser.add_argument('--output', default=None, help="The path of the JSON report, printed if not specified")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two JSON reports instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], 'r') as f: before = json.load(f)
+        with open(args.compare[1], 'r') as f: after = json.load(f)
+        compare_reports(before, after)
+        return
+
+    report = {'meta': _get_meta(), 'repeat': args.repeat, 'cases': {}}
+    for name in args.cases:
+        case = build_case(name)
+        report['cases'][name] = benchmark_case(case, repeat=args.repeat, memory=not args.no_memory)
+        print(f"{name}: {report['cases'][name]['total']:.3f}s", file=sys.stderr)
+    if args.output is None: print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+EGO = 'e0'
+
+def synthetic_network(numEntities: int = 500, numTimestamps: int = 20, degree: int = 4, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a random dynamic network with the columns of "source", "target", "time" (daily, "%Y-%m-%d"), and "weight".
+    At each timestamp, every entity takes part in `degree` relations on average. The ego, i.e., `EGO`, is forced into `degree` of them,
+    so that it appears at every timestamp, in at least one relation and about `degree` of them: the other relations may draw the ego as well,
+    and the aggregation may merge the forced ones. The relations are aggregated, i.e., one relation per (source, target, time).
+    """
+    rng = np.random.default_rng(seed)
+    names: np.ndarray = np.array([f'e{idx}' for idx in range(0, numEntities)])
+    numRelations: int = max(numEntities * degree // 2, degree)
+    frames = []
+    for tIdx in range(0, numTimestamps):
+        sources: np.ndarray = rng.integers(0, numEntities, numRelations)
+        targets: np.ndarray = rng.integers(0, numEntities, numRelations)
+        # The first `degree` relations involve the ego, either as the source or the target
+        egoAsSource: np.ndarray = rng.random(degree) < 0.5
+        sources[:degree] = np.where(egoAsSource, 0, rng.integers(1, numEntities, degree))
+        targets[:degree] = np.where(egoAsSource, rng.integers(1, numEntities, degree), 0)
+        frames.append(pd.DataFrame({
+            'source': names[sources],
+            'target': names[targets],
+            'time': (pd.Timestamp('2020-01-01') + pd.Timedelta(days=tIdx)).strftime('%Y-%m-%d'),
+            'weight': rng.integers(1, 4, numRelations),
+        }).loc[sources != targets, :])
+    network: pd.DataFrame = pd.concat(frames, ignore_index=True)
+    return network.drop_duplicates(subset=['source', 'target', 'time'], ignore_index=True)
+
+def hub_network(numNeighbors: int = 4000, numTwoHops: int = 4000, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate the relations of one timestamp around a hub ego, i.e., `EGO`, with the same columns as `synthetic_network()`.
+    The ego relates to `numNeighbors` one-hop neighbors, in either direction, where some also relate back with a random weight,
+    and `numTwoHops` relations connect a one-hop neighbor to a two-hop neighbor. The relations are aggregated, i.e., one per (source, target).
+    """
+    rng = np.random.default_rng(seed)
+    neighbors: np.ndarray = np.array([f'n{idx}' for idx in range(0, numNeighbors)])
+    egoAsSource: np.ndarray = rng.random(numNeighbors) < 0.5
+    sources: list = [np.where(egoAsSource, EGO, neighbors)]
+    targets: list = [np.where(egoAsSource, neighbors, EGO)]
+    # The reversed relations, whose weights decide which direction constrains the order
+    mutual: np.ndarray = rng.random(numNeighbors) < 0.2
+    sources.append(np.where(egoAsSource, neighbors, EGO)[mutual])
+    targets.append(np.where(egoAsSource, EGO, neighbors)[mutual])
+    oneHops: np.ndarray = neighbors[rng.integers(0, numNeighbors, numTwoHops)]
+    twoHops: np.ndarray = np.array([f'm{idx}' for idx in rng.integers(0, numTwoHops, numTwoHops)])
+    oneHopAsSource: np.ndarray = rng.random(numTwoHops) < 0.5
+    sources.append(np.where(oneHopAsSource, oneHops, twoHops))
+    targets.append(np.where(oneHopAsSource, twoHops, oneHops))
+    network = pd.DataFrame({'source': np.concatenate(sources), 'target': np.concatenate(targets), 'time': '2020-01-01'})
+    network['weight'] = rng.integers(1, 4, len(network))
+    return network.drop_duplicates(subset=['source', 'target', 'time'], ignore_index=True)
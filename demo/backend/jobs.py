@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class LayoutJobs():
+    """Computes the responses in a bounded pool of processes, so that a slow layout does not block the other requests.
+
+    Each job is identified by the key of its request, where the requests with the same key share the unfinished job instead of
+    computing it again. The finished responses are handed to `store`, and `lookup` returns the stored response of a key, if any.
+    A job times out `timeout` seconds after its submission. A queued job is then cancelled, while a running one can not be
+    interrupted, which still finishes in its process and stores its response. Until then, it is still unfinished,
+    i.e., it counts against `maxPending` and the requests with its key share it.
+
+    Parameters
+    ----------
+    compute: function. Returns the result of the parameters of a request, which runs in the processes, so it has to be picklable.
+    serialize: function. Returns the response of a result.
+    lookup: function. Returns the stored response of a key, or None.
+    store: function. Stores the response of a key.
+    workers: int. The number of processes.
+    maxPending: int. The maximal number of unfinished jobs, after which `submit()` raises QueueFull.
+    timeout: float. The seconds for each job to finish.
+    maxJobs: int. The number of jobs remembered for `status()`, where the oldest finished ones are forgotten first.
+    """
+    def __init__(self, compute, serialize, lookup, store, workers: int = 2, maxPending: int = 16, timeout: float = 60, maxJobs: int = 256):
+        self._compute = compute
+        self._serialize = serialize
+        self._lookup = lookup
+        self._store = store
+        self.workers: int = workers
+        self.maxPending: int = maxPending
+        self.timeout: float = timeout
+        self.maxJobs: int = maxJobs
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._jobs: OrderedDict = OrderedDict() # job id -> job, from the oldest
+        self._inflight: dict = {} # key -> the id of its unfinished job, including the timed-out ones still running
+        # Reentrant, since cancelling a future runs its callback, i.e., `_finish()`, in the same thread
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Starts the processes, which otherwise start upon the first job."""
+        self._executor.submit(time.time).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, key: str, params: dict) -> dict:
+        """Returns the status of the job computing the request, see `status()`."""
+        with self._lock:
+            self._check_timeouts()
+            jobID: str = self._inflight.get(key)
+            if jobID is not None: return self._describe(self._jobs[jobID])
+            job: dict = {'id': uuid.uuid4().hex, 'key': key, 'status': 'pending', 'submitted': time.time(),
+                         'finished': threading.Event(), 'future': None, 'response': None, 'error': None}
+            response = self._lookup(key)
+            if response is not None:
+                job.update({'status': 'done', 'response': response})
+                job['finished'].set()
+            else:
+                if len(self._inflight) >= self.maxPending: raise QueueFull(f"There are already {self.maxPending} unfinished jobs")
+                job['future'] = self._executor.submit(self._compute, params)
+                self._inflight[key] = job['id']
+            self._add(job)
+        # Outside the lock, since the callback runs immediately if the job has already finished
+        if job['future'] is not None: job['future'].add_done_callback(lambda future: self._finish(job, future))
+        return self.status(job['id'])
+
+    def wait(self, jobID: str, seconds: float) -> dict:
+        """Waits for at most `seconds`, or until the job finishes or times out, and returns its status."""
+        with self._lock:
+            job: dict = self._get(jobID)
+        remaining: float = job['submitted'] + self.timeout - time.time()
+        job['finished'].wait(max(min(seconds, remaining), 0))
+        return self.status(jobID)
+
+    def status(self, jobID: str) -> dict:
+        """
+        Returns the "id", "status", "elapsed" seconds since the submission, "response", and "error" of the job.
+        "status" is one of "queued", "running", "done", "failed", and "timeout", where "response" is available once "done".
+        """
+        with self._lock:
+            return self._describe(self._check_timeout(self._get(jobID)))
+
+    def _get(self, jobID: str) -> dict:
+        job: dict = self._jobs.get(jobID)
+        if job is None: raise KeyError(f"Unknown job: {jobID}")
+        return job
+
+    def _describe(self, job: dict) -> dict:
+        status: str = job['status']
+        if status == 'pending': status = 'running' if job['future'].running() else 'queued'
+        return {'id': job['id'], 'status': status, 'elapsed': time.time() - job['submitted'], 'response': job['response'], 'error': job['error']}
+
+    def _add(self, job: dict):
+        self._jobs[job['id']] = job
+        finished: list = [jobID for jobID, each in self._jobs.items() if each['finished'].is_set() and self._inflight.get(each['key']) != jobID]
+        for jobID in finished[:max(len(self._jobs) - self.maxJobs, 0)]:
+            del self._jobs[jobID]
+
+    def _check_timeout(self, job: dict) -> dict:
+        """Marks the job as timed out, and cancels it if still queued. It stays unfinished till its future is done, see `_finish()`."""
+        if job['status'] != 'pending' or time.time() - job['submitted'] <= self.timeout: return job
+        job.update({'status': 'timeout', 'error': f"Not finished in {self.timeout} seconds"})
+        job['finished'].set()
+        job['future'].cancel()
+        return job
+
+    def _check_timeouts(self):
+        """Checks all the unfinished jobs, so that the expired ones still queued are cancelled even if nobody polls them."""
+        for jobID in list(self._inflight.values()): self._check_timeout(self._jobs[jobID])
+
+    def _finish(self, job: dict, future):
+        response, error = None, None
+        if not future.cancelled():
+            try: response = self._serialize(future.result())
+            except Exception as e: error = f"{type(e).__name__}: {e}"
+        if response is not None: self._store(job['key'], response)
+        with self._lock:
+            if job['status'] == 'pending': job.update({'status': 'done' if error is None else 'failed', 'response': response, 'error': error})
+            self._release(job)
+
+    def _release(self, job: dict):
+        if self._inflight.get(job['key']) == job['id']: del self._inflight[job['key']]
+        job['finished'].set()
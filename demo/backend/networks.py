@@ -0,0 +1,120 @@
+import itertools
+import pandas as pd
+from SpreadLine.utils import construct_egocentric_network
+
+INTERNAL_COLOR = '#FA9902'
+EXTERNAL_COLOR = '#166b6b'
+
+def construct_ego_network(data: pd.DataFrame, ego: str, hops: int = 2, time: str = 'year', source: str = 'source', target: str = 'target') -> pd.DataFrame:
+    """
+    Returns the relations within `hops` of the ego at each time, see `construct_egocentric_network()` of SpreadLine,
+    given the names of the time, source, and target columns. The relations keep their columns and index.
+    """
+    edges: pd.DataFrame = data[[time, source, target]].set_axis(['time', 'source', 'target'], axis=1)
+    if not ((edges['source'] == ego) | (edges['target'] == ego)).any(): return data.iloc[[], :]
+    # The returned relations are indexed by their positions in `edges`
+    positions: pd.Index = construct_egocentric_network(ego, edges, hopLimit=hops).index
+    return data.iloc[positions, :].sort_index(kind='stable')
+
+def aggregate_citations(citations: pd.DataFrame, papers: list[str]) -> pd.DataFrame:
+    """
+    Returns the node contexts of the papers, i.e., the total "context" (citation count) per "entity" (author) and "time" (year),
+    given the citations with the columns of "name", "year", "citationcount", and "paperID", which are selected and summed in one pass.
+    """
+    selected: pd.DataFrame = citations.loc[citations['paperID'].isin(papers), :]
+    nodeContent = pd.DataFrame({
+        'entity': selected['name'],
+        'time': selected['year'].astype(str),
+        'context': selected['citationcount'].astype(int),
+    })
+    return nodeContent.groupby(['entity', 'time']).agg({'context': 'sum'}).reset_index()
+
+
+class AuthorNetworks():
+    """Constructs the ego networks of the co-authorships, e.g., the vis-author case study, where the data is prepared once for every ego.
+
+    Parameters
+    ----------
+    relations: pd.DataFrame. The co-authorships with the columns of "year", "source" (the first author), "target", "id" (the paper), and "count".
+    entities: pd.DataFrame. The affiliations of the authors with the columns of "name", "year", and "affiliation".
+    """
+    def __init__(self, relations: pd.DataFrame, entities: pd.DataFrame):
+        self.relations: pd.DataFrame = relations.assign(year=relations['year'].astype(str))
+        self.entities: pd.DataFrame = entities.assign(year=entities['year'].astype(str))
+        self._affiliations: dict = {} # affiliation_remap -> the unique (name, year, affiliation) after remapping
+
+    def get_affiliations(self, affiliation_remap) -> pd.DataFrame:
+        """Returns the unique remapped affiliations of each author and year, where each affiliation is only remapped once."""
+        if affiliation_remap not in self._affiliations:
+            affiliations: pd.Series = self.entities['affiliation']
+            remapped: dict = {each: affiliation_remap(each) for each in affiliations.drop_duplicates()}
+            frame = pd.DataFrame({'name': self.entities['name'], 'year': self.entities['year'], 'affiliation': affiliations.map(remapped)})
+            self._affiliations[affiliation_remap] = frame.drop_duplicates(ignore_index=True)
+        return self._affiliations[affiliation_remap]
+
+    def construct(self, ego: str, affiliation_remap, times: list[str] = []) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+        """
+        Returns the two-hop network of the papers of the ego, the line color of each author, and the groups of the authors per year, i.e.,
+        [external-non-first, external-first, ego, internal-first, internal-non-first], where the internal ones share any affiliation with the ego that year.
+        "count" of each relation is replaced by the number of papers in the network of its author, i.e., the first author if the ego is not, otherwise the other author.
+        """
+        relations: pd.DataFrame = self.relations
+        affiliations: pd.DataFrame = self.get_affiliations(affiliation_remap)
+        if times != []:
+            relations = relations.loc[relations['year'].isin(times), :]
+            affiliations = affiliations.loc[affiliations['year'].isin(times), :]
+        years = affiliations.loc[affiliations['name'] == ego, 'year'].unique()
+        relations = relations.loc[relations['year'].isin(years), :]
+        # All the sources are first-authors
+        network: pd.DataFrame = construct_ego_network(relations, ego)
+        # Remove those papers that ego wasn't even in
+        egoPapers = network.loc[(network['source'] == ego) | (network['target'] == ego), 'id'].unique()
+        network = network.loc[network['id'].isin(egoPapers), :].copy()
+
+        paperCounts: pd.Series = pd.concat([network[['source', 'id']].set_axis(['author', 'id'], axis=1),
+                                            network[['target', 'id']].set_axis(['author', 'id'], axis=1)]).groupby(by='author')['id'].nunique()
+        # The author of each relation is the first author if the ego is the non-first author
+        isFirst: pd.Series = network['target'] == ego
+        authors: pd.Series = network['source'].where(isFirst, network['target'])
+        egoAffiliations: pd.DataFrame = affiliations.loc[affiliations['name'] == ego, ['year', 'affiliation']]
+        internal = affiliations.merge(egoAffiliations, on=['year', 'affiliation'])[['year', 'name']].drop_duplicates()
+        isInternal = network[['year']].assign(name=authors).merge(internal, how='left', indicator=True)['_merge'].eq('both').to_numpy()
+        network['count'] = authors.map(paperCounts).to_numpy()
+
+        groupAssign: dict = {}
+        colorAssign: dict = {}
+        for year, author, first, inside in zip(network['year'], authors, isFirst, isInternal):
+            if year not in groupAssign: groupAssign[year] = [set(), set(), set([ego]), set(), set()]
+            if year not in colorAssign: colorAssign[year] = {}
+            groupIdx: int = (3 if inside else 1) if first else (4 if inside else 0)
+            groupAssign[year][groupIdx].add(author)
+            if author not in colorAssign[year]: colorAssign[year][author] = INTERNAL_COLOR if inside else EXTERNAL_COLOR
+
+        for (key, groups) in groupAssign.items():
+            pairIndices = list((i,j) for ((i,_),(j,_)) in itertools.combinations(enumerate(groups), 2))
+            for pairIdx in pairIndices:
+                if 2 in pairIdx: continue
+                pair = [groups[pairIdx[0]], groups[pairIdx[1]]]
+                if not pair[0].isdisjoint(pair[1]):
+                    firstIdx = pairIdx[0]
+                    secondIdx = pairIdx[1]
+                    intersection = pair[0].intersection(pair[1])
+                    if firstIdx in [0, 4]:
+                        groupAssign[key][firstIdx] = pair[0] - intersection
+                    elif secondIdx in [0, 4]:
+                        groupAssign[key][secondIdx] = pair[1] - intersection
+            newGroups = []
+            for idx, group in enumerate(groups):
+                newGroup = list(group)
+                if len(group) > 1: newGroup.sort(key=lambda x: paperCounts.get(x, 0), reverse=idx not in [0, 1])
+                newGroups.append(newGroup)
+            groupAssign[key] = newGroups
+
+        # The color of each author is the one in the first year it appears
+        lineColor: dict = {}
+        for year in network['year'].unique():
+            for author, color in colorAssign[year].items():
+                if author not in lineColor: lineColor[author] = color
+        entities = network['source'].unique().tolist() + network['target'].unique().tolist()
+        frames = [{'entity': entity, 'color': lineColor[entity]} for entity in entities if entity in lineColor]
+        return network, pd.DataFrame(frames), groupAssign
@@ -1,7 +1,14 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_cors import CORS, cross_origin
+import argparse
+import hashlib
+import json
 import logging
+import os
+import threading
 from views import *
+from jobs import LayoutJobs, QueueFull
+from SpreadLine.cache import LayoutCache
 
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.INFO)
@@ -10,7 +17,80 @@ log.setLevel(logging.INFO)
 app = Flask(__name__)
 CORS(app)
 
-    
+DEBUG = True
+DEFAULT_CASE = 'heer'
+WARMUP_CASES = ['metoo', 'heer', 'munzner'] # computed upon starting, so that the first requests are served from the cache
+
+# The serialized responses by the case study, ego, screen size, configuration, and the modified times of the files it reads,
+# so that modifying any of them invalidates the stored responses
+RESPONSES = LayoutCache(maxEntries=64)
+RESPONSES_LOCK = threading.Lock()
+
+# The pool computing the layouts outside of the request threads, see `serve_with_workers()`. None computes them in the request threads.
+JOBS: LayoutJobs = None
+
+
+def _parse_request(args) -> dict:
+    """Reads the query parameters: case, ego, width, height, and config (a JSON object passed to `SpreadLine.configure()`)."""
+    case = args.get('case', DEFAULT_CASE)
+    if case not in CASE_STUDIES: raise ValueError(f"Unknown case study: {case}")
+    study = CASE_STUDIES[case]
+    config = json.loads(args['config']) if args.get('config') else {}
+    if not isinstance(config, dict): raise ValueError("config should be a JSON object")
+    return {
+        'case': case,
+        'ego': args.get('ego', study['ego']),
+        'width': int(args.get('width', study['width'])),
+        'height': int(args.get('height', study['height'])),
+        'config': config,
+    }
+
+def _get_key(params: dict) -> str:
+    study = CASE_STUDIES[params['case']]
+    return hashlib.sha256(json.dumps([params, DATASETS.version(study['files'])], sort_keys=True).encode()).hexdigest()
+
+def _lookup(key: str) -> str|None:
+    with RESPONSES_LOCK:
+        return RESPONSES.get(key)
+
+def _store(key: str, body: str):
+    with RESPONSES_LOCK:
+        RESPONSES.put(key, body)
+
+def _serialize(result: dict) -> str:
+    return app.json.dumps({'resp': result})
+
+def _get_response(params: dict) -> str:
+    """Returns the serialized response, which is computed only if not stored or any file of the case study has been modified."""
+    key = _get_key(params)
+    body = _lookup(key)
+    if body is not None: return body
+    body = _serialize(compute_case(params))
+    _store(key, body)
+    return body
+
+def warmup(cases: list[str] = WARMUP_CASES):
+    """Preloads the files and computes the default layouts of the available case studies."""
+    for case in cases:
+        if not DATASETS.exists(CASE_STUDIES[case]['files']): continue
+        DATASETS.preload(CASE_STUDIES[case]['files'])
+        _get_response(_parse_request({'case': case}))
+
+def serve_with_workers(workers: int = 2, maxPending: int = 16, timeout: float = 60):
+    """Computes the layouts in a pool of `workers` processes, which also enables the `/jobs` endpoints, see `LayoutJobs`."""
+    global JOBS
+    JOBS = LayoutJobs(compute_case, _serialize, _lookup, _store, workers=workers, maxPending=maxPending, timeout=timeout)
+    JOBS.start()
+
+def _job_response(status: dict) -> Response:
+    """The response once done, otherwise the status of the job, see `LayoutJobs.status()`."""
+    if status['status'] == 'done': return Response(status['response'], mimetype='application/json')
+    code = {'queued': 202, 'running': 202, 'failed': 400, 'timeout': 504}[status['status']]
+    return jsonify(job=status['id'], status=status['status'], elapsed=status['elapsed'], error=status['error']), code
+
+def _get_wait(args) -> float:
+    return max(float(args.get('wait', 0)), 0)
+
 
 @app.route("/")
 @cross_origin()
@@ -20,13 +100,56 @@ def hello_world():
 @app.route("/fetchSpreadLine", methods=["GET"])
 @cross_origin()
 def fetchSites():
-    #result = computeAnimalSpreadLine()
-    #result = computeMetooSpreadLine()
-    result = computeJHSpreadLine()
-    #result = computeTMSpreadLine()
+    try:
+        params = _parse_request(request.args)
+    except ValueError as e: # json.JSONDecodeError is a ValueError as well
+        return jsonify(error=str(e)), 400
+    if JOBS is not None:
+        try: return _job_response(JOBS.wait(JOBS.submit(_get_key(params), params)['id'], JOBS.timeout))
+        except QueueFull as e: return jsonify(error=str(e)), 503
+    try:
+        body = _get_response(params)
+    except (KeyError, ValueError, IndexError) as e: # e.g., the ego is not in the network
+        return jsonify(error=f"Failed to compute the SpreadLine of {params['ego']}: {e}"), 400
+    return Response(body, mimetype='application/json')
+
+@app.route("/jobs", methods=["GET", "POST"])
+@cross_origin()
+def submitJob():
+    """
+    Submits a layout with the same query parameters as `/fetchSpreadLine`, plus `wait`, the seconds to wait for it.
+    Responds with the layout once done, otherwise the job id to poll `/jobs/<job>` with.
+    """
+    if JOBS is None: return jsonify(error="The server is not started with workers"), 404
+    try:
+        params = _parse_request(request.args)
+        wait = _get_wait(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    try: status = JOBS.submit(_get_key(params), params)
+    except QueueFull as e: return jsonify(error=str(e)), 503
+    if wait > 0: status = JOBS.wait(status['id'], wait)
+    return _job_response(status)
 
-    resp = jsonify(resp=result)
-    return resp
+@app.route("/jobs/<jobID>", methods=["GET"])
+@cross_origin()
+def fetchJob(jobID):
+    """Responds with the layout once done, otherwise the status of the job. `wait` is the seconds to wait for it."""
+    if JOBS is None: return jsonify(error="The server is not started with workers"), 404
+    try: wait = _get_wait(request.args)
+    except ValueError as e: return jsonify(error=str(e)), 400
+    try: status = JOBS.wait(jobID, wait) if wait > 0 else JOBS.status(jobID)
+    except KeyError as e: return jsonify(error=str(e)), 404
+    return _job_response(status)
 
 if __name__ == "__main__":
-    app.run(port=5300, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Serve the SpreadLine demo.")
+    parser.add_argument('--workers', type=int, default=0, help="The number of processes computing the layouts, 0 computes them in the request threads")
+    parser.add_argument('--max-pending', type=int, default=16, help="The maximal number of layouts being computed or queued")
+    parser.add_argument('--timeout', type=float, default=60, help="The seconds for each layout to finish")
+    args = parser.parse_args()
+    # With the reloader of the debug mode, only the process serving the requests warms up and starts the workers
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warmup()
+        if args.workers > 0: serve_with_workers(args.workers, maxPending=args.max_pending, timeout=args.timeout)
+    app.run(port=5300, debug=DEBUG, threaded=True)
@@ -1,46 +1,75 @@
 import pandas as pd
 import numpy as np
 from SpreadLine.spreadline import SpreadLine
-import itertools
-import json
+import os
+from networks import AuthorNetworks, aggregate_citations, construct_ego_network
 
-def computeAnimalSpreadLine():
-    path = '../../case-studies/animal-health'
+CASE_STUDIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'case-studies')
+
+class Datasets():
+    """The csv files of the case studies, read once and read again only when they are modified on disk."""
+    def __init__(self, root: str = CASE_STUDIES_PATH):
+        self.root = root
+        self._frames: dict = {} # relative path -> (modified time, pd.DataFrame)
+
+    def read(self, path: str) -> pd.DataFrame:
+        """Returns a copy of the csv file, given its path relative to the case studies."""
+        fullPath = os.path.join(self.root, path)
+        modified = os.path.getmtime(fullPath)
+        cached = self._frames.get(path)
+        if cached is None or cached[0] != modified:
+            cached = (modified, pd.read_csv(fullPath))
+            self._frames[path] = cached
+        return cached[1].copy()
+
+    def preload(self, paths: list[str]):
+        for path in paths: self.read(path)
+
+    def exists(self, paths: list[str]) -> bool:
+        return all([os.path.exists(os.path.join(self.root, path)) for path in paths])
+
+    def version(self, paths: list[str]) -> list[float]:
+        """The modified times of the files, which changes once any of them is modified."""
+        return [os.path.getmtime(os.path.join(self.root, path)) for path in paths]
+
+DATASETS = Datasets()
+
+def computeAnimalSpreadLine(ego='SI', width=1800, height=1000, config=None, datasets=DATASETS):
+    path = 'animal-health'
     SpreadLiner = SpreadLine()
 
-    SpreadLiner.load(f'{path}/records.csv', config={
+    SpreadLiner.load(datasets.read(f'{path}/records.csv'), config={
         'source': 'Source',
         'target': 'Target',
         'time': 'Date',
         'weight': 'Quantity',
     })
-    SpreadLiner.load(f'{path}/sites.csv', config={
+    SpreadLiner.load(datasets.read(f'{path}/sites.csv'), config={
         'timestamp': '',
         'id': 'grower',
         'posX': 'longitude',
         'posY': 'latitude',
     }, key='content')
-    SpreadLiner.load(f'{path}/status.csv', config={
+    SpreadLiner.load(datasets.read(f'{path}/status.csv'), config={
         'time': 'date',
         'entity': 'entity',
         'context': 'context',
     }, key='node')
-    SpreadLiner.load(f'{path}/sites.csv', config={
+    SpreadLiner.load(datasets.read(f'{path}/sites.csv'), config={
         'entity': 'grower',
         'color': 'color',
     }, key='line')
-    SpreadLiner.center(ego='SI')
-    result = SpreadLiner.fit(width=1800, height=1000) 
+    SpreadLiner.center(ego=ego)
+    if config: SpreadLiner.configure(config)
+    result = SpreadLiner.fit(width=width, height=height) 
     result.update({"mode": "animal"})
     return result
 
-def computeMetooSpreadLine():
-    path = '../../case-studies/metoo'
-    df = pd.read_csv(f'{path}/relations.csv')
-    entities = pd.read_csv(f'{path}/entities.csv')
-    network = _construct_ego_networks(df, 'Danny Masterson', time='Time', source='Source', target='Target')
-    with open(f'{path}/groups.json', 'r') as f:
-        groups = json.load(f)
+def computeMetooSpreadLine(ego='Danny Masterson', width=2600, height=500, config=None, datasets=DATASETS):
+    path = 'metoo'
+    df = datasets.read(f'{path}/relations.csv')
+    entities = datasets.read(f'{path}/entities.csv')
+    network = _construct_ego_networks(df, ego, time='Time', source='Source', target='Target')
     network['weight'] = df.apply(lambda row: row['ID'].count(',') + 1, axis=1)
 
     SpreadLiner = SpreadLine()
@@ -54,12 +83,12 @@ def computeMetooSpreadLine():
         'entity': 'entity',
         'color': 'color',
     }, key='line')
-    SpreadLiner.load(f'{path}/color.csv', config={
+    SpreadLiner.load(datasets.read(f'{path}/color.csv'), config={
         'time': 'date',
         'entity': 'entity',
         'context': 'attitude',
     }, key='node')
-    layout = pd.read_csv(f'{path}/layout.csv')
+    layout = datasets.read(f'{path}/layout.csv')
     SpreadLiner.load(layout, config={
         'timestamp': 'time',
         'id': 'name',
@@ -67,11 +96,12 @@ def computeMetooSpreadLine():
         'posY': 'posY',
     }, key='content')
 
-    SpreadLiner.center(ego='Danny Masterson')
+    SpreadLiner.center(ego=ego)
     SpreadLiner.configure({'squeezeSameCategory': True, 
                            'bandStretch': [['2023-09-07', '2023-09-10'], ['2023-09-17', '2023-09-19']], 
                            'minimize': 'line'})
-    result = SpreadLiner.fit(width = 2600, height = 500)
+    if config: SpreadLiner.configure(config)
+    result = SpreadLiner.fit(width = width, height = height)
     network['time'] = network['time'].apply(lambda x: x.strftime('%Y-%m-%d'))
     result.update({"mode": "metoo", 'reference': network.to_dict(orient='records')})
     return result
@@ -101,138 +131,31 @@ def _remap_JH_affiliation(affiliation):
 
 def _construct_ego_networks(data: pd.DataFrame, ego: str, HOP_LIMIT: int = 2, time: str = 'year', source: str = 'source', target: str = 'target') -> pd.DataFrame:
     # Note: make sure ego exists in each timepoint in data
-    indices = pd.Index([])
-    for _, entries in data.groupby(by=time): 
-        waitlist: set = {ego}
-        hop = 1
-        while len(waitlist) != 0 and hop <= HOP_LIMIT:
-            next_waitlist: list[str] = []
-            for each in waitlist:
-                sources = entries.loc[(data[target] == each), :]
-                targets = entries.loc[(data[source] == each), :]
-                candidates: list[str] = pd.concat([sources[source], targets[target]]).unique().tolist()
-                indices: pd.Index = indices.union(sources.index).union(targets.index)
-                next_waitlist.extend(candidates)
-            waitlist = set(next_waitlist) - set(waitlist)
-            hop += 1
     # returning the two-hop ego network, proved to be correct
-    return data.loc[indices, :]
+    return construct_ego_network(data, ego, hops=HOP_LIMIT, time=time, source=source, target=target)
 
 def _construct_author_network(ego, affiliation_remap, relationsPath = '../../case-studies/vis-author/relations.csv',
                               entitiesPath = '../../case-studies/vis-author/entities.csv', times=[]):
-    INTERNAL_COLOR = '#FA9902'
-    EXTERNAL_COLOR = '#166b6b'
-
-    relations = pd.read_csv(relationsPath)
-    relations['year'] = relations['year'].apply(lambda x: str(x))
-
-    allEntities = pd.read_csv(entitiesPath)
-    allEntities['year'] = allEntities['year'].apply(lambda x: str(x))
-    if times != []: 
-        allEntities = allEntities.loc[allEntities['year'].isin(times), :]
-        relations = relations.loc[relations['year'].isin(times), :]
-    egoStatus = allEntities.loc[allEntities['name'] == ego, ['affiliation', 'year']]
-    egoStatus['affiliation'] = egoStatus['affiliation'].apply(lambda x: affiliation_remap(x))
-    egoStatus = egoStatus.drop_duplicates()
-    egoStatus = egoStatus.set_index('year').squeeze().to_dict()
-    years = list(egoStatus.keys())
-
-    relations = relations.loc[relations['year'].isin(years), :]
-    # All the sources are first-authors
-    network = _construct_ego_networks(relations, ego)
-
-    # Remove those papers that ego wasn't even in
-    for paperID, group in network.groupby(by='id'):
-        nodes = group['source'].unique().tolist() + group['target'].unique().tolist()
-        if ego not in nodes: network = network.drop(index=group.index)
-    colorAssign = {}
-
-    def get_affiliations(author, year):
-        mask = (allEntities['name'] == author) & (allEntities['year'] == year)
-        #print(allEntities.loc[mask, 'affiliation'].tolist())
-        return allEntities.loc[mask, 'affiliation'].apply(lambda x: affiliation_remap(x)).unique()
-
-    groupAssign = {}
-    participation = {}
-    for idx, row in network.iterrows():
-        firstAuthor = row['source']
-        author = row['target']
-        year = row['year']
-        egoAffiliations = get_affiliations(ego, year)
-        #egoAffiliation = egoStatus[year]
-        # [external-non-first, external-first, ego, internal-first, internal-non-first]
-        if year not in groupAssign: groupAssign[year] = [set(), set(), set([ego]), set(), set()]
-        if year not in colorAssign: colorAssign[year] = {}
-
-        if author == ego:
-            # ego is the non-first author
-            affiliations = get_affiliations(firstAuthor, year)
-            intersection = set(affiliations).intersection(egoAffiliations)
-            color = INTERNAL_COLOR if len(intersection) != 0 else EXTERNAL_COLOR
-            if len(intersection) != 0: groupAssign[year][3].add(firstAuthor)
-            else: groupAssign[year][1].add(firstAuthor)
-            if colorAssign[year].get(firstAuthor, None) is None: colorAssign[year][firstAuthor] = color
-
-            allCollab = ((network['source'] == firstAuthor) | (network['target'] == firstAuthor))
-            collab = ((network['source'] == firstAuthor) | (network['target'] == firstAuthor))# & (network['year'] == year)
-        else: # either ego is the first author, or ego is the non-first author and this row is about others
-            affiliations = get_affiliations(author, year)
-
-            intersection = set(affiliations).intersection(egoAffiliations)
-            color = INTERNAL_COLOR if len(intersection) != 0 else EXTERNAL_COLOR
-
-            if color == INTERNAL_COLOR: groupAssign[year][4].add(author)
-            else: groupAssign[year][0].add(author)
-
-            if colorAssign[year].get(author, None) is None: colorAssign[year][author] = color
-
-            collab = ((network['source'] == author) | (network['target'] == author))# & (network['year'] == year)
-
-        network.at[idx, 'count'] = network.loc[collab, :]['id'].nunique()
-
-    papers = network['id'].unique().tolist()
-
-    for (key, groups) in groupAssign.items():
-        pairIndices = list((i,j) for ((i,_),(j,_)) in itertools.combinations(enumerate(groups), 2))
-        for pairIdx in pairIndices:
-            if 2 in pairIdx: continue
-            pair = [groups[pairIdx[0]], groups[pairIdx[1]]]
-            if not pair[0].isdisjoint(pair[1]): 
-                firstIdx = pairIdx[0]
-                secondIdx = pairIdx[1]
-                intersection = pair[0].intersection(pair[1])
-                if firstIdx in [0, 4]: 
-                    groupAssign[key][firstIdx] = pair[0] - intersection
-                elif secondIdx in [0, 4]: 
-                    groupAssign[key][secondIdx] = pair[1] - intersection
-        newGroups = []
-        
-        for idx, group in enumerate(groups):
-            if len(group) <= 1: 
-                newGroups.append(list(group))
-                continue
-            newGroup = list(group)
-            toBeReverse = False if idx in [0, 1] else True
-            newGroup.sort(key=lambda x: network.loc[(network['source'] == x) | (network['target'] == x), :]['id'].nunique(), reverse=toBeReverse)
-            newGroups.append(newGroup)
-        groupAssign[key] = newGroups
-
-    entities = network['source'].unique().tolist() + network['target'].unique().tolist()
-    frames = []
-    for entity in entities:
-        for year in network['year'].unique():
-            if colorAssign[year].get(entity, None) is None: continue
-            frames.append({'entity': entity, 'color': colorAssign[year].get(entity)})
-            break
-
-    return network, pd.DataFrame(frames), groupAssign
-
-def computeJHSpreadLine():
+    return AuthorNetworks(pd.read_csv(relationsPath), pd.read_csv(entitiesPath)).construct(ego, affiliation_remap, times=times)
+
+# The prepared co-authorships of each case study folder, as (the modified times of its files, AuthorNetworks),
+# so that the preparation and the remapped affiliations are reused by every request until the files are modified
+AUTHOR_NETWORKS: dict = {}
+
+def get_author_networks(path: str = 'vis-author', datasets=DATASETS) -> AuthorNetworks:
+    files = [f'{path}/relations.csv', f'{path}/entities.csv']
+    key = (datasets.root, path)
+    version = datasets.version(files)
+    cached = AUTHOR_NETWORKS.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, AuthorNetworks(datasets.read(files[0]), datasets.read(files[1])))
+        AUTHOR_NETWORKS[key] = cached
+    return cached[1]
+
+def computeJHSpreadLine(ego="Jeffrey Heer", width=2800, height=1000, config=None, datasets=DATASETS):
     SpreadLiner = SpreadLine()
-    ego = "Jeffrey Heer"
-    path = '../../case-studies/vis-author'
-    network, lineColor, groups = _construct_author_network(ego, _remap_JH_affiliation)
-    print(network.shape)
+    path = 'vis-author'
+    network, lineColor, groups = get_author_networks(path, datasets).construct(ego, _remap_JH_affiliation)
     SpreadLiner.load(network, config={
         'source': 'source',
         'target': 'target',
@@ -243,41 +166,35 @@ def computeJHSpreadLine():
         'entity': 'entity',
         'color': 'color',
     }, key='line')
-    citations = pd.read_csv(f'{path}/citations.csv')
-    papers = network['id'].unique().tolist() #133
-    frames = []
-    for paper in papers:
-        group= citations.loc[citations['paperID'] == paper, :]
-        for idx, row in group.iterrows():
-            frames.append({'entity': row['name'], 'time': str(row['year']), 'context': int(row['citationcount'])})
-    nodeContent = pd.DataFrame(frames).groupby(['entity', 'time']).agg({'context': 'sum'}).reset_index()
+    citations = datasets.read(f'{path}/citations.csv')
+    nodeContent = aggregate_citations(citations, network['id'].unique())
     SpreadLiner.load(nodeContent, config={
         'time': 'time',
         'entity': 'entity',
         'context': 'context',
     }, key='node')
-    layout = pd.read_csv(f'{path}/Heer/content.csv')
+    layout = datasets.read(f'{path}/Heer/content.csv')
     SpreadLiner.load(layout, config={
         'timestamp': 'year',
         'id': 'name',
         'posX': 'posX',
         'posY': 'posY',
     }, key='content')
-    reference = pd.read_csv(f'{path}/Heer/content_reference.csv')
+    reference = datasets.read(f'{path}/Heer/content_reference.csv')
 
 
     SpreadLiner.center(ego=ego, timeDelta='year', timeFormat='%Y', groups=groups)
     SpreadLiner.configure({"squeezeSameCategory": True, "minimize": "wiggles"}) 
-    result = SpreadLiner.fit(width = 2800, height = 1000)
+    if config: SpreadLiner.configure(config)
+    result = SpreadLiner.fit(width = width, height = height)
     result.update({"mode": "author", 'reference': reference.to_dict(orient='records')})
     return result
 
-def computeTMSpreadLine():
+def computeTMSpreadLine(ego='Tamara Munzner', width=2700, height=1000, config=None, datasets=DATASETS):
     SpreadLiner = SpreadLine()
-    ego = 'Tamara Munzner'
-    path = '../../case-studies/vis-author'
+    path = 'vis-author'
 
-    network, lineColor, groups = _construct_author_network(ego, _remap_TM_affiliation)
+    network, lineColor, groups = get_author_networks(path, datasets).construct(ego, _remap_TM_affiliation)
     SpreadLiner.load(network, config={
         'source': 'source',
         'target': 'target',
@@ -288,33 +205,54 @@ def computeTMSpreadLine():
         'entity': 'entity',
         'color': 'color',
     }, key='line')
-    citations = pd.read_csv(f'{path}/citations.csv') #97 papers
-    papers = network['id'].unique().tolist()
-    
-    frames = []
-    for paper in papers:
-        group= citations.loc[citations['paperID'] == paper, :]
-        for idx, row in group.iterrows():
-            frames.append({'entity': row['name'], 'time': str(row['year']), 'context': int(row['citationcount'])})
-    nodeContent = pd.DataFrame(frames).groupby(['entity', 'time']).agg({'context': 'sum'}).reset_index()
+    citations = datasets.read(f'{path}/citations.csv') #97 papers
+    nodeContent = aggregate_citations(citations, network['id'].unique())
     SpreadLiner.load(nodeContent, config={
         'time': 'time',
         'entity': 'entity',
         'context': 'context',
     }, key='node')
-    layout = pd.read_csv(f'{path}/Munzner/content.csv')
+    layout = datasets.read(f'{path}/Munzner/content.csv')
     SpreadLiner.load(layout, config={
         'timestamp': 'year',
         'id': 'name',
         'posX': 'posX',
         'posY': 'posY',
     }, key='content')
-    reference = pd.read_csv(f'{path}/Munzner/content_reference.csv')
+    reference = datasets.read(f'{path}/Munzner/content_reference.csv')
 
 
     SpreadLiner.center(ego=ego, timeDelta='year', timeFormat='%Y', groups=groups)
     SpreadLiner.configure({"squeezeSameCategory": True, "minimize": "wiggles"})
+    if config: SpreadLiner.configure(config)
 
-    result = SpreadLiner.fit(width = 2700, height = 1000)
+    result = SpreadLiner.fit(width = width, height = height)
     result.update({"mode": "author", 'reference': reference.to_dict(orient='records')})
     return result
+
+# The case studies served by the backend, with the csv files they read, and their default ego and screen size
+CASE_STUDIES = {
+    'animal': {
+        'compute': computeAnimalSpreadLine, 'ego': 'SI', 'width': 1800, 'height': 1000,
+        'files': ['animal-health/records.csv', 'animal-health/sites.csv', 'animal-health/status.csv'],
+    },
+    'metoo': {
+        'compute': computeMetooSpreadLine, 'ego': 'Danny Masterson', 'width': 2600, 'height': 500,
+        'files': ['metoo/relations.csv', 'metoo/entities.csv', 'metoo/color.csv', 'metoo/layout.csv'],
+    },
+    'heer': {
+        'compute': computeJHSpreadLine, 'ego': 'Jeffrey Heer', 'width': 2800, 'height': 1000,
+        'files': ['vis-author/relations.csv', 'vis-author/entities.csv', 'vis-author/citations.csv',
+                  'vis-author/Heer/content.csv', 'vis-author/Heer/content_reference.csv'],
+    },
+    'munzner': {
+        'compute': computeTMSpreadLine, 'ego': 'Tamara Munzner', 'width': 2700, 'height': 1000,
+        'files': ['vis-author/relations.csv', 'vis-author/entities.csv', 'vis-author/citations.csv',
+                  'vis-author/Munzner/content.csv', 'vis-author/Munzner/content_reference.csv'],
+    },
+}
+
+def compute_case(params: dict) -> dict:
+    """Computes the SpreadLine of a case study by the parameters of a request, i.e., "case", "ego", "width", "height", and "config"."""
+    study = CASE_STUDIES[params['case']]
+    return study['compute'](ego=params['ego'], width=params['width'], height=params['height'], config=params['config'])